@@ -0,0 +1,58 @@
+import heapq, itertools, threading, time
+
+class Agendador:
+    """Executa ações no instante marcado, em ordem de prazo.
+
+    Os eventos ficam num heap (O(log n) por evento) e a thread que chama
+    executar() dorme exatamente até o próximo prazo, ou até alguém agendar um
+    evento mais cedo. agendar() pode ser chamado de qualquer thread; as ações
+    sempre rodam na thread de executar().
+    """
+
+    def __init__(self, atraso=None):
+        # Histograma (metricas.Histograma) do atraso de cada evento em relação ao prazo
+        self.atraso = atraso
+        self.heap = []  # (timestamp, seq, acao, args)
+        self.seq = itertools.count()  # desempate: eventos no mesmo instante saem na ordem de agendamento
+        self.cond = threading.Condition()
+
+    def agendar(self, instante, acao, *args):
+        """Agenda acao(*args) para o datetime `instante`."""
+        with self.cond:
+            heapq.heappush(self.heap, (instante.timestamp(), next(self.seq), acao, args))
+            self.cond.notify()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def executar(self, ocioso=None, espera_maxima=10, parar_quando_vazio=True):
+        """Loop de eventos.
+
+        `ocioso` é chamado sempre que a espera termina sem evento vencido (no
+        máximo a cada `espera_maxima` segundos), por exemplo para manter os
+        heartbeats de uma conexão pika em dia.
+        """
+        while True:
+            evento = None
+            with self.cond:
+                if not self.heap:
+                    if parar_quando_vazio:
+                        return
+                    espera = espera_maxima
+                else:
+                    espera = self.heap[0][0] - time.time()
+
+                if espera > 0:
+                    self.cond.wait(min(espera, espera_maxima))
+                else:
+                    evento = heapq.heappop(self.heap)
+
+            if evento is None:
+                if ocioso is not None:
+                    ocioso()
+                continue
+
+            prazo, _, acao, args = evento
+            if self.atraso is not None:
+                self.atraso.observar(time.time() - prazo)
+            acao(*args)
@@ -0,0 +1,75 @@
+"""Esquemas de assinatura dos lances (rsa, ed25519, ecdsa) sobre (id do leilão, valor, nonce)."""
+import os, secrets, struct
+from Crypto.PublicKey import RSA, ECC
+from Crypto.Signature import pkcs1_15, eddsa, DSS
+from Crypto.Hash import SHA256
+
+ESQUEMAS = ("rsa", "ed25519", "ecdsa")
+
+_CANONICA = struct.Struct(">qdq")
+
+def mensagem_canonica(leilao_id, valor, nonce):
+    return _CANONICA.pack(leilao_id, float(valor), nonce)
+
+def novo_nonce():
+    return secrets.randbits(63)
+
+def caminhos(cliente, esquema, pasta="chaves"):
+    """(privada, pública) do cliente para o esquema."""
+    sufixo = "" if esquema == "rsa" else f"_{esquema}"
+    base = os.path.join(pasta, cliente)
+    return os.path.join(base, f"private{sufixo}.pem"), os.path.join(base, f"public{sufixo}.pem")
+
+def gerar_par(esquema):
+    """Retorna (privada, pública) em PEM."""
+    if esquema == "rsa":
+        key = RSA.generate(2048)
+        return key.export_key(), key.publickey().export_key()
+    key = ECC.generate(curve="ed25519" if esquema == "ed25519" else "P-256")
+    return key.export_key(format="PEM").encode(), key.public_key().export_key(format="PEM").encode()
+
+def _importar(esquema, pem):
+    return RSA.import_key(pem) if esquema == "rsa" else ECC.import_key(pem)
+
+class Assinador:
+    """Chave privada já parseada de um cliente, carregada uma vez por sessão."""
+
+    def __init__(self, cliente, esquema="rsa", pasta="chaves"):
+        if esquema not in ESQUEMAS:
+            raise ValueError(f"Esquema de assinatura desconhecido: {esquema}")
+        self.esquema = esquema
+        with open(caminhos(cliente, esquema, pasta)[0], "rb") as f:
+            key = _importar(esquema, f.read())
+
+        if esquema == "rsa":
+            self.signer = pkcs1_15.new(key)
+        elif esquema == "ed25519":
+            self.signer = eddsa.new(key, "rfc8032")
+        else:
+            self.signer = DSS.new(key, "fips-186-3")
+
+    def assinar(self, leilao_id, valor, nonce):
+        mensagem = mensagem_canonica(leilao_id, valor, nonce)
+        if self.esquema == "ed25519":
+            return self.signer.sign(mensagem)
+        return self.signer.sign(SHA256.new(mensagem))
+
+class Verificador:
+    """Chave pública parseada; verificar() levanta ValueError se a assinatura não confere."""
+
+    def __init__(self, esquema, pem):
+        self.esquema = esquema
+        key = _importar(esquema, pem)
+        if esquema == "rsa":
+            self.verifier = pkcs1_15.new(key)
+        elif esquema == "ed25519":
+            self.verifier = eddsa.new(key, "rfc8032")
+        else:
+            self.verifier = DSS.new(key, "fips-186-3")
+
+    def verificar(self, leilao_id, valor, nonce, assinatura):
+        mensagem = mensagem_canonica(leilao_id, valor, nonce)
+        if self.esquema == "ed25519":
+            self.verifier.verify(mensagem, assinatura)
+        else:
+            self.verifier.verify(SHA256.new(mensagem), assinatura)
@@ -0,0 +1,139 @@
+"""Benchmark ponta a ponta do leilão: bots -> lance.py -> notificacao.py -> leilao_<id>.
+
+Uso: python benchmark.py [--clientes 10] [--taxa 200] [--duracao 30] [--leiloes 100] [--memoria] [--direto] [--esquema ed25519]
+"""
+import base64, json, os, sys, threading, time
+import urllib.request
+from datetime import datetime, timedelta
+import codec
+import config
+from bot import Bot, argumentos
+
+def profundidade_filas(url, usuario, senha):
+    """Mensagens prontas + sem ack por fila, segundo a API de gerenciamento."""
+    pedido = urllib.request.Request(f"{url}/api/queues")
+    credenciais = base64.b64encode(f"{usuario}:{senha}".encode()).decode()
+    pedido.add_header("Authorization", f"Basic {credenciais}")
+    with urllib.request.urlopen(pedido, timeout=2) as resposta:
+        return {fila["name"]: fila.get("messages", 0) for fila in json.load(resposta)}
+
+def amostrar_filas(args, maximos, parar):
+    while not parar.is_set():
+        try:
+            for nome, mensagens in profundidade_filas(args.gerenciamento, args.usuario, args.senha).items():
+                maximos[nome] = max(maximos.get(nome, 0), mensagens)
+        except OSError as e:
+            maximos["erro"] = str(e)
+            return
+        parar.wait(1)
+
+def amostrar_filas_memoria(maximos, parar):
+    import broker_memoria
+    while not parar.is_set():
+        for nome, fila in list(broker_memoria.broker.filas.items()):
+            maximos[nome] = max(maximos.get(nome, 0), len(fila.mensagens))
+        parar.wait(1)
+
+def lances_processados(memoria):
+    """Total de lances processados pelo lance.py até agora (None se não der para ler)."""
+    if memoria:
+        import lance
+        return lance.RECEBIDOS.com().valor
+    porta = config.porta_metricas('lance')
+    if not porta:
+        return None
+    total = 0
+    for shard in range(config.shards()):
+        try:
+            with urllib.request.urlopen(f"http://{config.host()}:{porta + shard}/metrics", timeout=2) as resposta:
+                linhas = resposta.read().decode().splitlines()
+        except OSError:
+            return None
+        total += sum(float(linha.split()[1]) for linha in linhas if linha.startswith("leilao_lances_recebidos_total "))
+    return int(total)
+
+def cadastrar_leiloes(bot, quantidade, duracao):
+    """Cria leilões que começam agora e duram o benchmark inteiro (fila de controle do leilao.py)."""
+    base = int(time.time()) * 1000
+    inicio = datetime.now()
+    fim = inicio + timedelta(seconds=duracao + 5)
+    mensagens = [codec.codificar("cadastro", {"id": base + i, "descricao": f"Benchmark {i}", "inicio": inicio, "fim": fim})
+                 for i in range(quantidade)]
+    bot.publicador.publicar('leilao', 'cadastrar', codec.codificar_lote(mensagens), codec.PROPRIEDADES)
+
+def subir_servicos():
+    """Roda leilao.py, lance.py e notificacao.py em threads deste processo."""
+    import leilao, lance, notificacao
+    threading.Thread(target=lance.main, args=([],), daemon=True).start()
+    threading.Thread(target=notificacao.main, daemon=True).start()
+    threading.Thread(target=leilao.main, args=(["--controle"],), daemon=True).start()
+    time.sleep(0.5)  # dá tempo dos consumidores declararem as filas
+
+def percentil(valores, p):
+    if not valores:
+        return float("nan")
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+def main():
+    parser = argumentos(__doc__.splitlines()[0])
+    parser.add_argument("--leiloes", type=int, default=0, help="leilões a cadastrar antes da carga (0 = usar os que já existem)")
+    parser.add_argument("--gerenciamento", default="http://localhost:15672", help="URL da API de gerenciamento do RabbitMQ")
+    parser.add_argument("--usuario", default="guest")
+    parser.add_argument("--senha", default="guest")
+    parser.add_argument("--memoria", action="store_true", help="sobe os serviços neste processo, com o broker em memória")
+    parser.add_argument("--direto", action="store_true", help="lance.py publica direto em leilao.<id> (LEILAO_DIRETO=1)")
+    args = parser.parse_args()
+
+    if args.direto:
+        os.environ["LEILAO_DIRETO"] = "1"
+    if args.memoria:
+        os.environ["LEILAO_TRANSPORTE"] = "memoria"
+        subir_servicos()
+
+    bot = Bot(args.clientes, args.taxa, esquema=args.esquema)
+    bot.preparar()
+    if args.leiloes:
+        cadastrar_leiloes(bot, args.leiloes, args.duracao)
+
+    maximos = {}
+    parar = threading.Event()
+    if args.memoria:
+        threading.Thread(target=amostrar_filas_memoria, args=(maximos, parar), daemon=True).start()
+    else:
+        threading.Thread(target=amostrar_filas, args=(args, maximos, parar), daemon=True).start()
+
+    processados_antes = lances_processados(args.memoria)
+    inicio = time.perf_counter()
+    bot.executar(args.duracao)
+    time.sleep(2)  # deixa os últimos lances atravessarem o pipeline
+    decorrido = time.perf_counter() - inicio
+    parar.set()
+    processados = lances_processados(args.memoria)
+
+    latencias = sorted(bot.latencias)
+    print("\n=== BENCHMARK ===")
+    print(f"Lances enviados:       {bot.total_enviados} ({bot.total_enviados / args.duracao:.1f}/s)")
+    if processados is None or processados_antes is None:
+        print("Lances validados:      indisponível (ligue LEILAO_METRICAS_LANCE ou use --memoria)")
+    else:
+        validados = processados - processados_antes
+        print(f"Lances validados:      {validados} ({validados / decorrido:.1f}/s)")
+    print(f"Entregas aos clientes: {bot.total_recebidos} ({bot.total_recebidos / decorrido:.1f}/s)")
+    print(f"Lances aceitos medidos: {len(latencias)}")
+    for p in (50, 90, 99, 99.9):
+        print(f"Latência p{p:<5}        {percentil(latencias, p) * 1000:.2f} ms")
+    print("Profundidade máxima das filas:")
+    if "erro" in maximos:
+        print(f"  indisponível ({maximos.pop('erro')})")
+    for nome, mensagens in sorted(maximos.items(), key=lambda item: -item[1]):
+        print(f"  {nome:<50}{mensagens}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('Interrupted')
+        try:
+            sys.exit(0)
+        except SystemExit:
+            os._exit(0)
@@ -0,0 +1,142 @@
+"""Cliente automático: gera lances assinados numa taxa fixa, sem interface.
+
+Uso: python bot.py [--clientes 10] [--taxa 100] [--duracao 30] [--esquema ed25519]
+"""
+import argparse, os, random, sys, threading, time
+import codec
+import config
+import assinatura
+import cliente
+from conexao import Publicador, Assinante, exchange_atualizacoes, rota_atualizacoes, consultar_catalogo
+
+class Bot:
+    """Vários clientes simulados dando lances em todos os leilões que conhecem.
+
+    Acompanha os leilões como o cliente interativo (iniciar + leilao_<id>, ou
+    leilao.<id> no modo direto) e mede a latência de cada lance aceito: do
+    publish até a atualização com o mesmo (leilão, cliente, valor) chegar.
+    """
+
+    def __init__(self, clientes=10, taxa=100, incremento=(1, 10), esquema=None):
+        self.nomes = [f"bot{i}" for i in range(clientes)]
+        self.esquema = esquema or config.esquema_assinatura()
+        self.taxa = taxa
+        self.incremento = incremento
+        self.publicador = Publicador([('lance', 'direct'), ('leilao', 'direct')])
+        self.assinante = Assinante('leilao')
+        self.atualizacoes = Assinante(*exchange_atualizacoes()) if config.notificacao_direta() else self.assinante
+        self.assinadores = {}
+        self.valores = {}  # id -> maior valor conhecido
+        self.ids = []
+        self.enviados = {}  # id -> {(cliente, valor): instante do envio}
+        self.latencias = []
+        self.total_enviados = 0
+        self.total_recebidos = 0
+        self.lock = threading.Lock()
+
+    def preparar(self):
+        for nome in self.nomes:
+            cliente.gerar_chaves(nome, self.esquema, via=self.publicador)
+            self.assinadores[nome] = assinatura.Assinador(nome, self.esquema)
+
+        threading.Thread(target=self.assinante.executar, daemon=True).start()
+        if self.atualizacoes is not self.assinante:
+            threading.Thread(target=self.atualizacoes.executar, daemon=True).start()
+        self.assinante.assinar('iniciar', self.ao_iniciar)
+        for obj in consultar_catalogo():
+            self.acompanhar(obj['id'], obj['valor'] or 0.0)
+
+    def ao_iniciar(self, body):
+        for obj in codec.decodificar_todos(body):
+            self.acompanhar(obj['id'], 0.0)
+
+    def acompanhar(self, leilao_id, valor):
+        with self.lock:
+            if leilao_id in self.valores:
+                return
+            self.valores[leilao_id] = valor
+            self.ids.append(leilao_id)
+        self.atualizacoes.assinar(rota_atualizacoes(leilao_id), self.ao_atualizar)
+
+    def ao_atualizar(self, body):
+        agora = time.perf_counter()
+        lance = codec.decodificar(body)
+        with self.lock:
+            self.total_recebidos += 1
+            if lance['valor'] is not None:
+                if lance['id'] in self.valores:
+                    self.valores[lance['id']] = max(self.valores[lance['id']], lance['valor'])
+                enviados = self.enviados.get(lance['id'])
+                if enviados:
+                    enviado = enviados.pop((lance['cliente'], lance['valor']), None)
+                    if enviado is not None:
+                        self.latencias.append(agora - enviado)
+                    # Lances até este valor que não voltaram foram rejeitados ou
+                    # coalescidos e não vão mais voltar
+                    for chave in [chave for chave in enviados if chave[1] <= lance['valor']]:
+                        del enviados[chave]
+            if lance['status'] == 'finalizado':
+                self.enviados.pop(lance['id'], None)
+                if lance['id'] in self.valores:
+                    del self.valores[lance['id']]
+                    self.ids.remove(lance['id'])
+
+    def dar_lance(self):
+        with self.lock:
+            if not self.ids:
+                return False
+            leilao_id = random.choice(self.ids)
+            # Sobe o valor conhecido já no envio, para os próximos lances irem acima deste
+            valor = round(self.valores[leilao_id] + random.uniform(*self.incremento), 2)
+            self.valores[leilao_id] = valor
+
+        nome = random.choice(self.nomes)
+        nonce = assinatura.novo_nonce()
+        sig = self.assinadores[nome].assinar(leilao_id, valor, nonce)
+        body = codec.codificar("lance", {"id": leilao_id, "valor": valor, "cliente": nome, "assinatura": sig,
+                                         "esquema": self.esquema, "nonce": nonce})
+
+        with self.lock:
+            self.enviados.setdefault(leilao_id, {})[(nome, valor)] = time.perf_counter()
+            self.total_enviados += 1
+        self.publicador.publicar('lance', f'publicar.{config.shard_de(leilao_id)}', body, codec.propriedades_com_horario())
+        return True
+
+    def executar(self, duracao):
+        intervalo = 1 / self.taxa
+        proximo = time.perf_counter()
+        fim = proximo + duracao
+        while time.perf_counter() < fim:
+            if not self.dar_lance():
+                time.sleep(0.1)
+                proximo = time.perf_counter()
+                continue
+            proximo += intervalo
+            espera = proximo - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+
+def argumentos(descricao):
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument("--clientes", type=int, default=10, help="quantidade de clientes simulados")
+    parser.add_argument("--taxa", type=float, default=100, help="lances por segundo (somando todos os clientes)")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de carga")
+    parser.add_argument("--esquema", choices=assinatura.ESQUEMAS, default=None, help="esquema de assinatura (padrão LEILAO_ESQUEMA)")
+    return parser
+
+def main():
+    args = argumentos(__doc__.splitlines()[0]).parse_args()
+    bot = Bot(args.clientes, args.taxa, esquema=args.esquema)
+    bot.preparar()
+    bot.executar(args.duracao)
+    print(f"{bot.total_enviados} lances enviados, {bot.total_recebidos} atualizações recebidas")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('Interrupted')
+        try:
+            sys.exit(0)
+        except SystemExit:
+            os._exit(0)
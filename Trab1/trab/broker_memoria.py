@@ -0,0 +1,251 @@
+"""Broker em memória com a interface (o subconjunto que usamos) da BlockingConnection do pika."""
+import heapq, itertools, queue, threading, time
+from collections import deque
+
+class Metodo:
+    __slots__ = ("routing_key", "delivery_tag", "queue")
+
+    def __init__(self, routing_key=None, delivery_tag=None, queue=None):
+        self.routing_key = routing_key
+        self.delivery_tag = delivery_tag
+        self.queue = queue
+
+class Resultado:
+    def __init__(self, metodo):
+        self.method = metodo
+
+class Fila:
+    def __init__(self, nome, dona=None):
+        self.nome = nome
+        self.dona = dona  # conexão dona, se exclusiva
+        self.mensagens = deque()  # (exchange, routing_key, properties, body)
+        self.consumidor = None  # (canal, callback, auto_ack)
+
+class Broker:
+    def __init__(self):
+        self.exchanges = {}  # nome -> tipo
+        self.bindings = {}  # exchange -> {routing_key: set(nomes de fila)}
+        self.filas = {}
+        self.lock = threading.Lock()
+        self.contador = itertools.count(1)
+
+    def declarar_exchange(self, nome, tipo):
+        with self.lock:
+            tipo_atual = self.exchanges.setdefault(nome, tipo)
+        if tipo_atual != tipo:
+            raise ValueError(f"Exchange {nome} já declarada como {tipo_atual}")
+
+    def declarar_fila(self, nome, conexao, exclusiva):
+        with self.lock:
+            if not nome:
+                nome = f"amq.gen-{next(self.contador)}"
+            if nome not in self.filas:
+                self.filas[nome] = Fila(nome, conexao if exclusiva else None)
+        return nome
+
+    def ligar(self, exchange, fila, routing_key):
+        with self.lock:
+            self.bindings.setdefault(exchange, {}).setdefault(routing_key, set()).add(fila)
+
+    def desligar(self, exchange, fila, routing_key):
+        with self.lock:
+            self.bindings.get(exchange, {}).get(routing_key, set()).discard(fila)
+
+    def destino(self, exchange, routing_key):
+        if exchange == "":
+            return {routing_key} if routing_key in self.filas else set()
+        rotas = self.bindings.get(exchange, {})
+        if self.exchanges.get(exchange) != "topic":
+            return rotas.get(routing_key, ())
+        palavras = routing_key.split(".")
+        return {fila for padrao, filas in rotas.items() if casa_topico(padrao.split("."), palavras) for fila in filas}
+
+    def publicar(self, exchange, routing_key, body, properties):
+        with self.lock:
+            filas = [self.filas[nome] for nome in self.destino(exchange, routing_key) if nome in self.filas]
+        for fila in filas:
+            fila.mensagens.append((exchange, routing_key, properties, body))
+            if fila.consumidor is not None:
+                fila.consumidor[0].connection.acordar()
+
+    def remover_filas_de(self, conexao):
+        with self.lock:
+            nomes = [nome for nome, fila in self.filas.items() if fila.dona is conexao]
+            for nome in nomes:
+                del self.filas[nome]
+            for rotas in self.bindings.values():
+                for filas in rotas.values():
+                    filas.difference_update(nomes)
+
+def casa_topico(padrao, palavras):
+    """Casamento de routing key de exchange topic: * é uma palavra, # é zero ou mais."""
+    if not padrao:
+        return not palavras
+    if padrao[0] == "#":
+        return any(casa_topico(padrao[1:], palavras[i:]) for i in range(len(palavras) + 1))
+    if not palavras:
+        return False
+    return padrao[0] in ("*", palavras[0]) and casa_topico(padrao[1:], palavras[1:])
+
+broker = Broker()
+
+class Canal:
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.prefetch = 0
+        self.tags = itertools.count(1)
+        self.nao_confirmadas = deque()
+        self.filas = []
+        self.consumindo = False
+
+    def exchange_declare(self, exchange, exchange_type='direct', **kwargs):
+        self.broker.declarar_exchange(exchange, exchange_type)
+
+    def queue_declare(self, queue='', exclusive=False, **kwargs):
+        nome = self.broker.declarar_fila(queue, self.connection, exclusive)
+        return Resultado(Metodo(queue=nome))
+
+    def queue_bind(self, queue, exchange, routing_key=None, **kwargs):
+        self.broker.ligar(exchange, queue, routing_key if routing_key is not None else queue)
+
+    def queue_unbind(self, queue, exchange, routing_key=None, **kwargs):
+        self.broker.desligar(exchange, queue, routing_key if routing_key is not None else queue)
+
+    def basic_qos(self, prefetch_count=0, **kwargs):
+        self.prefetch = prefetch_count
+
+    def confirm_delivery(self):
+        # A publicação em memória já é síncrona; não há o que confirmar
+        pass
+
+    def basic_publish(self, exchange, routing_key, body, properties=None, **kwargs):
+        self.broker.publicar(exchange, routing_key, body, properties)
+
+    def basic_consume(self, queue, on_message_callback, auto_ack=False, **kwargs):
+        fila = self.broker.filas[queue]
+        fila.consumidor = (self, on_message_callback, auto_ack)
+        self.filas.append(fila)
+        self.connection.acordar()
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        if multiple:
+            while self.nao_confirmadas and self.nao_confirmadas[0] <= delivery_tag:
+                self.nao_confirmadas.popleft()
+        else:
+            self.nao_confirmadas.remove(delivery_tag)
+
+    def start_consuming(self):
+        self.consumindo = True
+        while self.consumindo:
+            self.connection._passo(1.0)
+
+    def stop_consuming(self):
+        self.consumindo = False
+
+    def consume(self, queue, auto_ack=False, inactivity_timeout=None):
+        """Gerador como o do pika: (method, properties, body), ou (None, None, None) após
+        `inactivity_timeout` segundos sem mensagens."""
+        recebidas = deque()
+        self.basic_consume(queue, lambda ch, method, properties, body: recebidas.append((method, properties, body)), auto_ack)
+        ultima = time.monotonic()
+        while True:
+            if recebidas:
+                ultima = time.monotonic()
+                yield recebidas.popleft()
+                continue
+
+            espera = 1.0 if inactivity_timeout is None else ultima + inactivity_timeout - time.monotonic()
+            if espera <= 0:
+                ultima = time.monotonic()
+                yield None, None, None
+                continue
+            self.connection._passo(espera)
+
+    def _entregar(self):
+        entregou = False
+        for fila in self.filas:
+            _, callback, auto_ack = fila.consumidor
+            while fila.mensagens and (auto_ack or not self.prefetch or len(self.nao_confirmadas) < self.prefetch):
+                exchange, routing_key, properties, body = fila.mensagens.popleft()
+                tag = next(self.tags)
+                if not auto_ack:
+                    self.nao_confirmadas.append(tag)
+                callback(self, Metodo(routing_key, tag), properties, body)
+                entregou = True
+        return entregou
+
+    def close(self):
+        self.consumindo = False
+
+class Conexao:
+    def __init__(self, broker=broker):
+        self.broker = broker
+        self.eventos = queue.Queue()  # callbacks de outras threads; None só acorda
+        self.timers = []  # (instante, seq, callback)
+        self.seq = itertools.count()
+        self.canais = []
+
+    def channel(self):
+        canal = Canal(self)
+        self.canais.append(canal)
+        return canal
+
+    def acordar(self):
+        self.eventos.put(None)
+
+    def add_callback_threadsafe(self, callback):
+        self.eventos.put(callback)
+
+    def call_later(self, atraso, callback):
+        heapq.heappush(self.timers, (time.monotonic() + atraso, next(self.seq), callback))
+
+    def process_data_events(self, time_limit=0):
+        # Como no pika, None espera até haver alguma atividade
+        self._passo(1.0 if time_limit is None else time_limit)
+
+    def sleep(self, duracao):
+        fim = time.monotonic() + duracao
+        while time.monotonic() < fim:
+            self._passo(fim - time.monotonic())
+
+    def _passo(self, espera):
+        """Roda o que estiver pronto; se não havia nada, espera até `espera` segundos por atividade."""
+        fez = False
+        while self.timers and self.timers[0][0] <= time.monotonic():
+            heapq.heappop(self.timers)[2]()
+            fez = True
+
+        while True:
+            try:
+                callback = self.eventos.get_nowait()
+            except queue.Empty:
+                break
+            if callback is not None:
+                callback()
+                fez = True
+
+        for canal in self.canais:
+            fez = canal._entregar() or fez
+
+        if fez or espera <= 0:
+            return
+
+        if self.timers:
+            espera = min(espera, self.timers[0][0] - time.monotonic())
+        try:
+            callback = self.eventos.get(timeout=max(0, espera))
+        except queue.Empty:
+            return
+        if callback is not None:
+            callback()
+        for canal in self.canais:
+            canal._entregar()
+
+    def close(self):
+        for canal in self.canais:
+            canal.close()
+        self.broker.remover_filas_de(self)
+
+def conectar():
+    return Conexao(broker)
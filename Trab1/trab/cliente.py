@@ -1,177 +1,165 @@
-import json
-import sys,os,pika,threading,base64
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
-
-leiloes = []
+import sys,os,threading
+from repositorio import Leilao, RepositorioLeiloes
+import codec
+import config
+import assinatura
+from conexao import Publicador, Assinante, exchange_atualizacoes, rota_atualizacoes, consultar_catalogo
+from tela import Tela
+
+leiloes = RepositorioLeiloes()
 ativos = []
 cliente = ""
+publicador = None
+assinante = None
+atualizacoes = None  # assinante das atualizações de cada leilão (o próprio assinante, fora do modo direto)
+tela = None
+assinador = None  # chave privada da sessão, carregada no primeiro lance
 
 def main():
     if len(sys.argv) < 2:
         print("Uso: python lance.py <cliente>")
         sys.exit(1)
 
-    global cliente
+    global cliente, publicador, assinante, atualizacoes, tela
     cliente = sys.argv[1]
 
-    gerar_chaves(cliente)
+    publicador = Publicador([('lance', 'direct')])
+    assinante = Assinante('leilao')
 
-    t1 = threading.Thread(target=adicionar_leiloes)
+    gerar_chaves(cliente, config.esquema_assinatura())
+
+    tela = Tela(leiloes, fps=config.fps_tela(), tamanho_pagina=config.tamanho_pagina())
+
+    t1 = threading.Thread(target=assinante.executar, daemon=True)
     t1.start()
+    atualizacoes = assinante
+    if config.notificacao_direta():
+        atualizacoes = Assinante(*exchange_atualizacoes())
+        threading.Thread(target=atualizacoes.executar, daemon=True).start()
+    adicionar_leiloes()
+    carregar_catalogo()
     
     t2 = threading.Thread(target=aguarda_user)
     t2.start()
 
     t2.join()
 
-def gerar_chaves(cliente):
+def gerar_chaves(cliente, esquema="rsa", via=None):
+    """Gera o par de chaves se ainda não existir; a rotação é avisada por `via` (padrão, o publicador da sessão)."""
     pasta = os.path.join("chaves", cliente)
     os.makedirs(pasta, exist_ok=True)
 
-    private_path = os.path.join(pasta, "private.pem")
-    public_path = os.path.join(pasta, "public.pem")
+    private_path, public_path = assinatura.caminhos(cliente, esquema)
 
     if not os.path.exists(private_path) or not os.path.exists(public_path):
-        print("Gerando par de chaves para", cliente)
-        key = RSA.generate(2048)
+        print("Gerando par de chaves", esquema, "para", cliente)
+        private_key, public_key = assinatura.gerar_par(esquema)
 
-        private_key = key.export_key()
         with open(private_path, "wb") as f:
             f.write(private_key)
 
-        public_key = key.publickey().export_key()
         with open(public_path, "wb") as f:
             f.write(public_key)
 
         print("Chaves geradas em", pasta)
+        avisar_rotacao_chave(cliente, via)
     else:
         print("Chaves já existentes em", pasta)
 
+def avisar_rotacao_chave(cliente, via=None):
+    # Avisa o validador para descartar a chave pública antiga que estiver em cache
+    (via or publicador).publicar('lance', 'rotacionar_chave', codec.codificar("rotacao", {"cliente": cliente}), codec.PROPRIEDADES)
+
 def adicionar_leiloes():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
-    channel = connection.channel()
-    channel.exchange_declare(exchange='leilao', exchange_type='direct')
-    result = channel.queue_declare(queue='', exclusive=True)
-    queue_name = result.method.queue
-    channel.queue_bind(exchange='leilao', queue=queue_name, routing_key='iniciar')
-    
-    def callback(ch, method, properties, body): 
-        global leiloes 
-        leilao = body.decode() 
-        obj = eval(leilao, {}) 
-        leiloes.append(obj)
-        mostrar_leiloes()
-        print("> ")
-
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
-    channel.start_consuming()
-
-def mostrar_leiloes():
-    print("\n=== LEILÕES EM EXECUÇÃO ===")
-
-    if not leiloes:
-        print("Nenhum leilão ativo no momento.")
-    else:
-        print(f"{'Nº':<5}{'Descrição':<30}{'Valor':<10}{'Último Lance':<20}{'Status':<10}")
-        print("-" * 80)
+    def callback(body): 
+        for obj in codec.decodificar_todos(body):
+            leiloes.adicionar(Leilao(obj['id'], obj['descricao']))
+        tela.marcar_tudo()
 
-        for i, leilao in enumerate(leiloes):
-            valor = f"R${leilao['valor']:.2f}" if 'valor' in leilao and leilao['valor'] is not None else "-"
-            ultimo_lance = leilao['cliente'] if 'cliente' in leilao and leilao['cliente'] is not None else "-"
-            status = leilao['status'] if 'status' in leilao else "ativo"
-            print(f"{i:<5}{leilao['descricao']:<30}{valor:<10}{ultimo_lance:<20}{status:<10}")
+    assinante.assinar('iniciar', callback)
 
-    print("=" * 80)
-    print("Digite: <numero_do_leilao> <valor_do_lance>")
-    print("Ou digite 'sair' para encerrar\n")
+def carregar_catalogo():
+    # Leilões que já estavam em andamento antes do cliente entrar. Vem depois da
+    # assinatura do iniciar, para nenhum leilão cair no intervalo entre os dois.
+    for obj in consultar_catalogo():
+        if leiloes.buscar(obj['id']) is None:
+            leiloes.adicionar(Leilao(obj['id'], obj['descricao'], status=obj['status'], valor=obj['valor'], cliente=obj['cliente']))
+    tela.marcar_tudo()
 
 def aguarda_user():
     while True:
-        mostrar_leiloes()
-        comando = input("> ").strip()
+        comando = input().strip()
+        tela.avisar("")
 
         if comando.lower() == "sair":
             print("Encerrando trabalhador...")
             break
 
         partes = comando.split()
+        if partes and partes[0].lower() == "f":
+            tela.filtrar(" ".join(partes[1:]))
+            continue
+
+        if len(partes) == 2 and partes[0].lower() == "p":
+            try:
+                tela.ir_para(int(partes[1]) - 1)
+            except ValueError:
+                tela.avisar("Página deve ser um número.")
+            continue
+
         if len(partes) != 2:
-            print("Formato inválido! Use: <numero> <valor>")
+            tela.avisar("Formato inválido! Use: <numero> <valor>")
             continue
 
         try:
             idx = int(partes[0])
             valor = float(partes[1])
         except ValueError:
-            print("Número do leilão deve ser inteiro e valor deve ser numérico.")
+            tela.avisar("Número do leilão deve ser inteiro e valor deve ser numérico.")
             continue
 
-        if idx < 0 or idx >= len(leiloes):
-            print("Leilão inválido.")
+        lista = leiloes.listar()
+        if idx < 0 or idx >= len(lista):
+            tela.avisar("Leilão inválido.")
             continue
 
-        publicar_lance(leiloes[idx], valor)
-
-def assinar_valor(valor, cliente):
-    private_path = os.path.join("chaves", cliente, "private.pem")
-
-    with open(private_path, "rb") as f:
-        key = RSA.import_key(f.read())
+        publicar_lance(lista[idx], valor)
 
-    message = str(valor).encode()
-    h = SHA256.new(message)
-
-    signature = pkcs1_15.new(key).sign(h)
-
-    return base64.b64encode(signature).decode()
+def assinar_valor(leilao_id, valor):
+    """Assina (id, valor, nonce) com a chave da sessão; retorna (assinatura, nonce)."""
+    global assinador
+    if assinador is None:
+        assinador = assinatura.Assinador(cliente, config.esquema_assinatura())
+    nonce = assinatura.novo_nonce()
+    return assinador.assinar(leilao_id, valor, nonce), nonce
 
 def publicar_lance(leilao, valor):
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
-    channel = connection.channel()
-    channel.exchange_declare(exchange='lance', exchange_type='direct')
-    channel.basic_publish(exchange='lance', routing_key='publicar', body=json.dumps({"id": leilao['id'], "valor": valor, "cliente": cliente, "assinatura": assinar_valor(valor, cliente)}))
-    if(leilao['id'] in ativos):
+    sig, nonce = assinar_valor(leilao.id, valor)
+    publicador.publicar('lance', f'publicar.{config.shard_de(leilao.id)}', codec.codificar("lance", {"id": leilao.id, "valor": valor, "cliente": cliente, "assinatura": sig, "esquema": assinador.esquema, "nonce": nonce}), codec.propriedades_com_horario())
+    if(leilao.id in ativos):
         return
-    threading.Thread(target=acompanhar_leilao, args=(leilao['id'],)).start()
-    ativos.append(leilao['id'])
+    acompanhar_leilao(leilao.id)
+    ativos.append(leilao.id)
 
 def acompanhar_leilao(id):
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
-    channel = connection.channel()
-    channel.exchange_declare(exchange='leilao', exchange_type='direct')
-    result = channel.queue_declare(queue='', exclusive=True)
-    queue_name = result.method.queue
-    channel.queue_bind(exchange='leilao', queue=queue_name, routing_key=f'leilao_{id}')
-
-    def callback(ch, method, properties, body):
-        lance = eval(body.decode())
+    def callback(body):
+        lance = codec.decodificar(body)
+        leilao = leiloes.buscar(id)
+        if leilao is None:
+            return
+
         valor = lance.get('valor')
         if(valor is not None):
-            for leilao in leiloes:
-                if leilao['id'] == id:
-                    leilao['valor'] = lance['valor']
-                    leilao['cliente'] = lance['cliente']
-                    leilao['status'] = lance['status']
-                    break
+            leilao.valor = lance['valor']
+            leilao.cliente = lance['cliente']
         
         status = lance.get('status')
         if(status is not None):
-            for leilao in leiloes:
-                if leilao['id'] == id:
-                    leilao['status'] = lance['status']
-                    break
+            leiloes.atualizar_status(leilao, status)
         
-        mostrar_leiloes()
-        print("> ")
+        tela.marcar(leilao.id)
 
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
-    channel.start_consuming()
+    atualizacoes.assinar(rota_atualizacoes(id), callback)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,154 @@
+"""Formato binário das mensagens trocadas entre os serviços do leilão."""
+import struct, time
+from datetime import datetime
+import pika
+
+VERSAO = 1
+CONTENT_TYPE = f"application/x-leilao; v={VERSAO}"
+PROPRIEDADES = pika.BasicProperties(content_type=CONTENT_TYPE)
+
+# Cabeçalho com o instante do envio, em milissegundos desde a época. Não vai no
+# campo timestamp do AMQP: ele é em segundos, e o aio-pika o decodifica como datetime
+HORARIO_ENVIO = "enviado_ms"
+
+def propriedades_com_horario():
+    """Propriedades com o instante do envio, para o consumidor medir o atraso na fila."""
+    return pika.BasicProperties(content_type=CONTENT_TYPE, headers={HORARIO_ENVIO: time.time_ns() // 1_000_000})
+
+def propriedades_rpc(correlation_id, reply_to=None):
+    """Propriedades de um pedido (com reply_to) ou de uma resposta RPC."""
+    return pika.BasicProperties(content_type=CONTENT_TYPE, correlation_id=correlation_id, reply_to=reply_to)
+
+def atraso_fila(properties):
+    """Segundos desde o envio, ou None se a mensagem não veio com horário.
+
+    Aceita as propriedades do pika ou a mensagem do aio-pika (ambas têm `headers`).
+    """
+    headers = getattr(properties, "headers", None)
+    if not headers or HORARIO_ENVIO not in headers:
+        return None
+    return time.time() - headers[HORARIO_ENVIO] / 1000
+
+ESQUEMAS = {
+    "iniciar": (1, (("id", "i"), ("descricao", "s"))),
+    "encerrar": (2, (("id", "i"), ("descricao", "s"), ("inicio", "t"), ("fim", "t"), ("status", "s"))),
+    "lance": (3, (("id", "i"), ("valor", "f"), ("cliente", "s"), ("assinatura", "b"), ("esquema", "s"), ("nonce", "i"))),
+    "lance_validado": (4, (("id", "i"), ("valor", "f"), ("cliente", "s"), ("status", "s"))),
+    "vencedor": (5, (("id", "i"), ("vencedor", "s"), ("valor", "f"))),
+    "rotacao": (6, (("cliente", "s"),)),
+    "cadastro": (7, (("id", "i"), ("descricao", "s"), ("inicio", "t"), ("fim", "t"))),
+    "estado": (8, (("id", "i"), ("descricao", "s"), ("valor", "f"), ("cliente", "s"), ("status", "s"))),
+    "consulta_catalogo": (9, (("apos", "i"), ("limite", "i"))),
+    "pagina_catalogo": (10, (("proximo", "i"),)),
+}
+
+LOTE = 0
+
+_POR_CODIGO = {codigo: (tipo, campos) for tipo, (codigo, campos) in ESQUEMAS.items()}
+
+# versão | tipo | máscara dos campos nulos; depois os campos não nulos, na ordem
+# do esquema. Strings e bytes são prefixados pelo tamanho (até TAMANHO_MAXIMO).
+# Um lote (tipo 0) leva a quantidade de itens e cada item prefixado pelo tamanho.
+_CABECALHO = struct.Struct(">BBH")
+_INT = struct.Struct(">q")
+_FLOAT = struct.Struct(">d")
+_TAMANHO = struct.Struct(">H")
+_TAMANHO_ITEM = struct.Struct(">I")
+TAMANHO_MAXIMO = 0xFFFF
+
+def codificar(tipo, dados):
+    """Codifica o dicionário `dados` segundo o esquema `tipo`. Campos ausentes viram nulos."""
+    codigo, campos = ESQUEMAS[tipo]
+    mascara = 0
+    partes = [b""]
+
+    for i, (nome, formato) in enumerate(campos):
+        valor = dados.get(nome)
+        if valor is None:
+            mascara |= 1 << i
+        elif formato == "i":
+            partes.append(_INT.pack(valor))
+        elif formato == "f":
+            partes.append(_FLOAT.pack(valor))
+        elif formato == "t":
+            partes.append(_FLOAT.pack(valor.timestamp()))
+        else:
+            if formato == "s":
+                valor = valor.encode()
+            if len(valor) > TAMANHO_MAXIMO:
+                raise ValueError(f"Campo {nome} de {tipo} com {len(valor)} bytes (máximo {TAMANHO_MAXIMO})")
+            partes.append(_TAMANHO.pack(len(valor)))
+            partes.append(valor)
+
+    partes[0] = _CABECALHO.pack(VERSAO, codigo, mascara)
+    return b"".join(partes)
+
+def ler_id(body):
+    """Lê só o campo id (o primeiro de todo esquema que o tem) sem decodificar o resto."""
+    _, codigo, mascara = _CABECALHO.unpack_from(body, 0)
+    if codigo == LOTE or mascara & 1 or _POR_CODIGO[codigo][1][0][0] != "id":
+        raise ValueError("Mensagem sem id")
+    return _INT.unpack_from(body, _CABECALHO.size)[0]
+
+def decodificar(body):
+    """Decodifica uma mensagem e retorna o dicionário com todos os campos do esquema."""
+    versao, codigo, mascara = _CABECALHO.unpack_from(body, 0)
+    if versao != VERSAO:
+        raise ValueError(f"Versão de mensagem não suportada: {versao}")
+    if codigo == LOTE:
+        raise ValueError("Mensagem é um lote, use decodificar_todos")
+    if codigo not in _POR_CODIGO:
+        raise ValueError(f"Tipo de mensagem desconhecido: {codigo}")
+
+    _, campos = _POR_CODIGO[codigo]
+    pos = _CABECALHO.size
+    dados = {}
+
+    for i, (nome, formato) in enumerate(campos):
+        if mascara & (1 << i):
+            dados[nome] = None
+        elif formato == "i":
+            dados[nome] = _INT.unpack_from(body, pos)[0]
+            pos += 8
+        elif formato == "f":
+            dados[nome] = _FLOAT.unpack_from(body, pos)[0]
+            pos += 8
+        elif formato == "t":
+            dados[nome] = datetime.fromtimestamp(_FLOAT.unpack_from(body, pos)[0])
+            pos += 8
+        else:
+            tamanho = _TAMANHO.unpack_from(body, pos)[0]
+            pos += 2
+            valor = bytes(body[pos:pos + tamanho])
+            dados[nome] = valor.decode() if formato == "s" else valor
+            pos += tamanho
+
+    return dados
+
+def codificar_lote(mensagens):
+    """Junta mensagens já codificadas num único corpo."""
+    partes = [_CABECALHO.pack(VERSAO, LOTE, 0), _TAMANHO_ITEM.pack(len(mensagens))]
+    for mensagem in mensagens:
+        partes.append(_TAMANHO_ITEM.pack(len(mensagem)))
+        partes.append(mensagem)
+    return b"".join(partes)
+
+def decodificar_todos(body):
+    """Decodifica um corpo que pode ser uma mensagem avulsa ou um lote; sempre retorna uma lista."""
+    versao, codigo, _ = _CABECALHO.unpack_from(body, 0)
+    if codigo != LOTE:
+        return [decodificar(body)]
+    if versao != VERSAO:
+        raise ValueError(f"Versão de mensagem não suportada: {versao}")
+
+    body = memoryview(body)
+    pos = _CABECALHO.size
+    quantidade = _TAMANHO_ITEM.unpack_from(body, pos)[0]
+    pos += 4
+    mensagens = []
+    for _ in range(quantidade):
+        tamanho = _TAMANHO_ITEM.unpack_from(body, pos)[0]
+        pos += 4
+        mensagens.append(decodificar(body[pos:pos + tamanho]))
+        pos += tamanho
+    return mensagens
@@ -0,0 +1,187 @@
+import threading, queue, time, uuid
+import pika
+import codec
+import config
+import transporte
+from consumo import preparar_consumo
+
+EXCHANGE_TOPICO = 'leilao_topico'
+
+# Espera antes de reconectar o Publicador, dobrando a cada falha seguida
+ESPERA_RECONEXAO = 0.5
+ESPERA_RECONEXAO_MAXIMA = 30
+
+def exchange_atualizacoes():
+    """(nome, tipo) da exchange em que chegam as atualizações de cada leilão."""
+    if config.notificacao_direta():
+        return EXCHANGE_TOPICO, 'topic'
+    return 'leilao', 'direct'
+
+def rota_atualizacoes(leilao_id):
+    """Routing key das atualizações de um leilão: leilao.<id> (direto) ou leilao_<id> (via notificacao.py)."""
+    if config.notificacao_direta():
+        return f'leilao.{leilao_id}'
+    return f'leilao_{leilao_id}'
+
+def consultar_catalogo(timeout=5.0):
+    """Leilões ativos de todos os shards, com valor e líder atuais (RPC sobre AMQP).
+
+    O primeiro pedido vai para todos os shards de uma vez; cada resposta é um
+    lote [pagina_catalogo, estado, ...] e, se houver mais páginas, o pedido da
+    próxima sai assim que ela chega. Um shard que não responde em `timeout`
+    segundos fica de fora (o cliente ainda recebe os leilões dele pelo iniciar).
+    """
+    connection = transporte.conectar()
+    channel = connection.channel()
+    channel.exchange_declare(exchange='lance', exchange_type='direct')
+    fila = channel.queue_declare(queue='', exclusive=True).method.queue
+    pendentes = {}  # correlation_id -> shard
+    limite = config.tamanho_pagina_catalogo()
+
+    def pedir(shard, apos):
+        correlation_id = uuid.uuid4().hex
+        pendentes[correlation_id] = shard
+        channel.basic_publish(
+            exchange='lance',
+            routing_key=f'catalogo.{shard}',
+            body=codec.codificar("consulta_catalogo", {"apos": apos, "limite": limite}),
+            properties=codec.propriedades_rpc(correlation_id, reply_to=fila))
+
+    for shard in range(config.shards()):
+        pedir(shard, None)
+
+    estados = []
+    try:
+        for method, properties, body in channel.consume(fila, auto_ack=True, inactivity_timeout=timeout):
+            if method is None:
+                print(f"Catálogo incompleto: sem resposta de {len(pendentes)} shard(s)")
+                break
+            shard = pendentes.pop(properties.correlation_id, None)
+            if shard is None:
+                continue
+            pagina, *itens = codec.decodificar_todos(body)
+            estados.extend(itens)
+            if pagina['proximo'] is not None:
+                pedir(shard, pagina['proximo'])
+            if not pendentes:
+                break
+    finally:
+        connection.close()
+    return estados
+
+class Publicador:
+    """Conexão de publicação de longa duração.
+
+    A BlockingConnection do pika não é thread-safe, então só a thread de I/O
+    do publicador toca nela; as outras threads apenas enfileiram mensagens.
+    """
+
+    def __init__(self, exchanges):
+        self.exchanges = exchanges  # [(nome, tipo)]
+        self.fila = queue.Queue()
+        self.connection = None
+        self.channel = None
+        self.thread = threading.Thread(target=self._executar, daemon=True)
+        self.thread.start()
+
+    def publicar(self, exchange, routing_key, body, properties=None):
+        self.fila.put((exchange, routing_key, body, properties))
+
+    def fechar(self):
+        self.fila.put(None)
+        self.thread.join()
+
+    def _conectar(self):
+        connection = transporte.conectar()
+        channel = connection.channel()
+        for nome, tipo in self.exchanges:
+            channel.exchange_declare(exchange=nome, exchange_type=tipo)
+        return connection, channel
+
+    def _desconectar(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = self.channel = None
+
+    def _tentar(self, acao):
+        """Executa acao(connection, channel), reconectando com espera crescente até conseguir."""
+        espera = ESPERA_RECONEXAO
+        while True:
+            try:
+                if self.connection is None:
+                    self.connection, self.channel = self._conectar()
+                return acao(self.connection, self.channel)
+            except pika.exceptions.AMQPError as e:
+                print(f"Falha na conexão de publicação ({e!r}), reconectando em {espera:.1f}s...")
+                self._desconectar()
+                time.sleep(espera)
+                espera = min(espera * 2, ESPERA_RECONEXAO_MAXIMA)
+
+    def _executar(self):
+        self._tentar(lambda connection, channel: None)
+        while True:
+            try:
+                item = self.fila.get(timeout=1)
+            except queue.Empty:
+                # Mantém os heartbeats da conexão em dia enquanto não há o que publicar
+                self._tentar(lambda connection, channel: connection.process_data_events(time_limit=0))
+                continue
+
+            if item is None:
+                break
+
+            exchange, routing_key, body, properties = item
+            self._tentar(lambda connection, channel: channel.basic_publish(
+                exchange=exchange, routing_key=routing_key, body=body, properties=properties))
+
+        self._desconectar()
+
+class Assinante:
+    """Um único canal de consumo com uma fila exclusiva.
+
+    Cada assinatura nova é só mais um queue_bind nessa fila; as mensagens são
+    despachadas para o callback registrado para a sua routing key.
+    """
+
+    def __init__(self, exchange, exchange_type='direct'):
+        self.exchange = exchange
+        self.exchange_type = exchange_type
+        self.callbacks = {}  # routing_key -> callback(body)
+        self.pronto = threading.Event()
+        self.connection = None
+        self.channel = None
+        self.queue_name = None
+
+    def assinar(self, routing_key, callback):
+        """Passa a receber as mensagens com essa routing key. Pode ser chamado de qualquer thread."""
+        self.callbacks[routing_key] = callback
+        self.pronto.wait()
+        self.connection.add_callback_threadsafe(
+            lambda: self.channel.queue_bind(exchange=self.exchange, queue=self.queue_name, routing_key=routing_key))
+
+    def executar(self):
+        """Loop de consumo; deve rodar na sua própria thread."""
+        self.connection = transporte.conectar()
+        self.channel = self.connection.channel()
+        self.channel.exchange_declare(exchange=self.exchange, exchange_type=self.exchange_type)
+        result = self.channel.queue_declare(queue='', exclusive=True)
+        self.queue_name = result.method.queue
+
+        # Assinaturas feitas antes da conexão ficar pronta
+        for routing_key in list(self.callbacks):
+            self.channel.queue_bind(exchange=self.exchange, queue=self.queue_name, routing_key=routing_key)
+
+        acks = preparar_consumo(self.channel, 'cliente')
+
+        def despachar(ch, method, properties, body):
+            callback = self.callbacks.get(method.routing_key)
+            if callback is not None:
+                callback(body)
+            acks.confirmar(method.delivery_tag)
+
+        self.channel.basic_consume(queue=self.queue_name, on_message_callback=despachar)
+        self.pronto.set()
+        self.channel.start_consuming()
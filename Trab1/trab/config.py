@@ -0,0 +1,96 @@
+"""Parâmetros dos serviços, lidos de LEILAO_<NOME> ou LEILAO_<NOME>_<SERVICO>."""
+import os
+
+def ler(nome, servico=None, padrao=None):
+    if servico is not None:
+        valor = os.environ.get(f"LEILAO_{nome}_{servico.upper()}")
+        if valor is not None:
+            return valor
+    return os.environ.get(f"LEILAO_{nome}", padrao)
+
+def prefetch(servico):
+    """Quantas mensagens o broker entrega sem ack para cada consumidor."""
+    return int(ler("PREFETCH", servico, "256"))
+
+def ack_lote(servico):
+    """A cada quantas mensagens processadas é enviado um ack múltiplo."""
+    return int(ler("ACK_LOTE", servico, "32"))
+
+def confirmar_publicacoes(servico):
+    """Se as publicações do serviço esperam a confirmação (publisher confirm) do broker.
+
+    Desligado por padrão: no BlockingChannel do pika cada basic_publish passa a
+    esperar uma ida e volta ao broker, e não há como confirmar em lote.
+    """
+    return ler("CONFIRMAR", servico, "0") == "1"
+
+def shards():
+    """Em quantas partições (instâncias do lance.py) os leilões são divididos."""
+    return int(ler("SHARDS", None, "1"))
+
+def shard_de(leilao_id):
+    """Partição dona do leilão; os lances dele vão para a routing key publicar.<shard>."""
+    return leilao_id % shards()
+
+def ler_shard(argv):
+    """Lê `--shard K` da linha de comando (padrão 0)."""
+    shard = int(argv[argv.index("--shard") + 1]) if "--shard" in argv else 0
+    if not 0 <= shard < shards():
+        raise SystemExit(f"Shard {shard} fora do intervalo 0..{shards() - 1} (LEILAO_SHARDS={shards()})")
+    return shard
+
+def pasta_dados():
+    """Onde o lance.py guarda o write-ahead log e os snapshots."""
+    return ler("DADOS", None, "dados")
+
+def intervalo_snapshot():
+    """A cada quantos registros no WAL é gravado um snapshot novo."""
+    return int(ler("SNAPSHOT", None, "10000"))
+
+def fsync_wal():
+    """Se cada sincronização do WAL faz fsync (sobrevive a queda da máquina, não só do processo)."""
+    return ler("WAL_FSYNC", None, "0") == "1"
+
+def fps_tela():
+    """Máximo de redesenhos por segundo da tabela do cliente."""
+    return float(ler("FPS", None, "4"))
+
+def tamanho_pagina():
+    """Leilões por página na tabela do cliente."""
+    return int(ler("PAGINA", None, "20"))
+
+def transporte():
+    """'pika' (RabbitMQ) ou 'memoria' (broker em memória, tudo no mesmo processo)."""
+    return ler("TRANSPORTE", None, "pika")
+
+def host():
+    return ler("HOST", None, "localhost")
+
+def esquema_assinatura():
+    """Esquema com que o cliente assina os lances: rsa, ed25519 ou ecdsa."""
+    return ler("ESQUEMA", None, "rsa")
+
+def esquemas_aceitos():
+    """Esquemas de assinatura que o validador aceita (separados por vírgula)."""
+    return frozenset(ler("ESQUEMAS", None, "rsa,ed25519,ecdsa").split(","))
+
+def notificacao_direta():
+    """Se o lance.py publica os lances validados direto para os clientes (exchange
+    topic leilao_topico, routing key leilao.<id>), sem o repasse do notificacao.py."""
+    return ler("DIRETO", None, "0") == "1"
+
+def janela_coalescencia(servico):
+    """Segundos em que as atualizações de um mesmo leilão são juntadas numa só (0 = desligado)."""
+    return float(ler("JANELA", servico, "0"))
+
+def porta_metricas(servico):
+    """Porta do endpoint /metrics do serviço (0 = sem endpoint)."""
+    return int(ler("METRICAS", servico, "0"))
+
+def tamanho_pagina_catalogo():
+    """Máximo de leilões por resposta da consulta de catálogo ao lance.py."""
+    return int(ler("PAGINA_CATALOGO", None, "1000"))
+
+def historico():
+    """Se o lance.py guarda o histórico de lances de cada leilão (em <dados>/historico_<shard>)."""
+    return ler("HISTORICO", None, "1") == "1"
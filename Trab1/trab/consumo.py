@@ -0,0 +1,81 @@
+import config
+
+class AckEmLote:
+    """Acks manuais em lote: um basic_ack(multiple=True) a cada `tamanho` mensagens.
+
+    Só é correto com um consumidor por canal que processa as mensagens na ordem
+    de entrega. Um timer na própria conexão confirma o que ficou pendente
+    quando o fluxo para, senão as mensagens restantes ocupariam o prefetch
+    para sempre.
+    """
+
+    def __init__(self, channel, tamanho, intervalo=0.2):
+        self.channel = channel
+        self.tamanho = tamanho
+        self.intervalo = intervalo
+        self.ultima_tag = None
+        self.pendentes = 0
+        channel.connection.call_later(intervalo, self._timer)
+
+    def confirmar(self, delivery_tag):
+        self.ultima_tag = delivery_tag
+        self.pendentes += 1
+        if self.pendentes >= self.tamanho:
+            self.descarregar()
+
+    def descarregar(self):
+        if self.pendentes:
+            self.channel.basic_ack(delivery_tag=self.ultima_tag, multiple=True)
+            self.pendentes = 0
+
+    def _timer(self):
+        self.descarregar()
+        self.channel.connection.call_later(self.intervalo, self._timer)
+
+def preparar_consumo(channel, servico):
+    """Aplica o prefetch do serviço ao canal e retorna o seu AckEmLote."""
+    prefetch = config.prefetch(servico)
+    channel.basic_qos(prefetch_count=prefetch)
+    # Um lote maior que o prefetch nunca encheria
+    return AckEmLote(channel, max(1, min(config.ack_lote(servico), prefetch)))
+
+def preparar_publicacao(channel, servico):
+    """Liga publisher confirms no canal, se configurado (LEILAO_CONFIRMAR=1):
+    basic_publish passa a esperar o ack do broker, uma ida e volta por
+    mensagem, e levanta exceção em caso de nack."""
+    if config.confirmar_publicacoes(servico):
+        channel.confirm_delivery()
+
+class Coalescedor:
+    """Janela de coalescência por leilão para as atualizações que vão aos clientes.
+
+    A primeira atualização de um leilão abre uma janela de `janela` segundos;
+    as que chegam dentro dela só substituem a pendente, e no fim da janela sai
+    uma única mensagem. Como toda atualização já traz o maior lance atual do
+    leilão, a última basta. Com janela 0 tudo é publicado na hora.
+
+    Os timers rodam na conexão, então só deve ser usado pela thread dela.
+    """
+
+    def __init__(self, connection, publicar, janela):
+        self.connection = connection
+        self.publicar = publicar  # publicar(leilao_id, body)
+        self.janela = janela
+        self.pendentes = {}  # leilao_id -> última atualização
+
+    def adicionar(self, leilao_id, body):
+        if self.janela <= 0:
+            self.publicar(leilao_id, body)
+            return
+        if leilao_id not in self.pendentes:
+            self.connection.call_later(self.janela, lambda: self.descarregar(leilao_id))
+        self.pendentes[leilao_id] = body
+
+    def descarregar(self, leilao_id):
+        body = self.pendentes.pop(leilao_id, None)
+        if body is not None:
+            self.publicar(leilao_id, body)
+
+    def descartar(self, leilao_id):
+        """Esquece a atualização pendente (o leilão foi finalizado e o aviso final já leva o vencedor)."""
+        self.pendentes.pop(leilao_id, None)
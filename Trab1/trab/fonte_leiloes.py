@@ -0,0 +1,33 @@
+import csv, json, os
+from datetime import datetime
+import codec
+from repositorio import Leilao
+
+def ler_arquivo(caminho):
+    """Lê leilões de um arquivo .csv ou .jsonl, um por vez (gerador).
+
+    Colunas/chaves esperadas: id, descricao, inicio, fim, com as datas em ISO
+    8601. Para que o leilao.py mantenha só uma janela de leilões em memória o
+    arquivo deve estar ordenado por inicio.
+
+    Leilões com descrição maior do que o codec aceita são pulados com um aviso:
+    o gerador é consumido pelo agendador, e uma exceção ali derrubaria o leilao.py.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    with open(caminho, newline="", encoding="utf-8") as f:
+        if extensao == ".csv":
+            linhas = csv.DictReader(f)
+        else:
+            linhas = (json.loads(linha) for linha in f if linha.strip())
+
+        for linha in linhas:
+            tamanho = len(linha["descricao"].encode())
+            if tamanho > codec.TAMANHO_MAXIMO:
+                print(f"Leilão {linha['id']} ignorado: descrição com {tamanho} bytes (máximo {codec.TAMANHO_MAXIMO})")
+                continue
+            yield Leilao(
+                int(linha["id"]),
+                linha["descricao"],
+                datetime.fromisoformat(linha["inicio"]),
+                datetime.fromisoformat(linha["fim"]),
+                status="aguardando inicio")
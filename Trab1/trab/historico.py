@@ -0,0 +1,186 @@
+"""Histórico de lances por leilão, em colunas, gravado em <pasta>/<id>.hist quando o leilão termina.
+
+Uso: python historico.py <arquivo.hist> [--intervalo 1]
+"""
+import array, os, struct, sys, threading, time
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VERSAO = 1
+# "HIST" | versão | linhas | clientes; depois os nomes dos clientes e as colunas
+# inteiras (instantes, valores, clientes, aceitos), em little-endian
+_CABECALHO = struct.Struct("<4sBII")
+_TAMANHO = struct.Struct("<H")
+
+class HistoricoLeilao:
+    """As colunas de um leilão."""
+
+    def __init__(self):
+        self.instantes = array.array("d")
+        self.valores = array.array("d")
+        self.clientes = array.array("I")
+        self.aceitos = array.array("b")
+        self.nomes = []  # índice -> cliente
+        self.indices = {}  # cliente -> índice
+
+    def adicionar(self, instante, valor, cliente, aceito):
+        indice = self.indices.get(cliente)
+        if indice is None:
+            indice = self.indices[cliente] = len(self.nomes)
+            self.nomes.append(cliente)
+        self.instantes.append(instante)
+        self.valores.append(valor)
+        self.clientes.append(indice)
+        self.aceitos.append(aceito)
+
+    def __len__(self):
+        return len(self.instantes)
+
+    def copiar(self):
+        copia = HistoricoLeilao()
+        copia.instantes = array.array("d", self.instantes)
+        copia.valores = array.array("d", self.valores)
+        copia.clientes = array.array("I", self.clientes)
+        copia.aceitos = array.array("b", self.aceitos)
+        copia.nomes = list(self.nomes)
+        copia.indices = dict(self.indices)
+        return copia
+
+    def taxa(self, intervalo=1.0):
+        """Lances por janela de `intervalo` segundos, a partir do primeiro: [(início, quantidade)]."""
+        if not self.instantes:
+            return []
+        inicio = self.instantes[0]
+        if np is not None:
+            janelas = ((np.array(self.instantes) - inicio) // intervalo).astype(np.int64)
+            contagens = np.bincount(janelas).tolist()
+        else:
+            contagens = [0] * (int((self.instantes[-1] - inicio) // intervalo) + 1)
+            for instante in self.instantes:
+                contagens[int((instante - inicio) // intervalo)] += 1
+        return [(inicio + i * intervalo, quantidade) for i, quantidade in enumerate(contagens)]
+
+    def curva_preco(self):
+        """(instantes, valores) dos lances aceitos, isto é, a evolução do maior lance."""
+        if np is not None:
+            aceitos = np.array(self.aceitos, dtype=bool)
+            return np.array(self.instantes)[aceitos].tolist(), np.array(self.valores)[aceitos].tolist()
+        linhas = [(t, v) for t, v, aceito in zip(self.instantes, self.valores, self.aceitos) if aceito]
+        return [t for t, _ in linhas], [v for _, v in linhas]
+
+    def maiores_lances(self, n=5):
+        """Os `n` clientes com o maior lance: [(cliente, maior valor, quantidade de lances)]."""
+        if not self.instantes:
+            return []
+        if np is not None:
+            clientes = np.array(self.clientes, dtype=np.int64)
+            quantidades = np.bincount(clientes, minlength=len(self.nomes))
+            maiores = np.full(len(self.nomes), -np.inf)
+            np.maximum.at(maiores, clientes, np.array(self.valores))
+            ordem = np.argsort(-maiores)[:n]
+            return [(self.nomes[i], float(maiores[i]), int(quantidades[i])) for i in ordem]
+        quantidades = Counter(self.clientes)
+        maiores = {}
+        for indice, valor in zip(self.clientes, self.valores):
+            if valor > maiores.get(indice, float("-inf")):
+                maiores[indice] = valor
+        ordem = sorted(maiores, key=maiores.get, reverse=True)[:n]
+        return [(self.nomes[i], maiores[i], quantidades[i]) for i in ordem]
+
+    def gravar(self, caminho):
+        temporario = caminho + ".tmp"
+        with open(temporario, "wb") as f:
+            f.write(_CABECALHO.pack(b"HIST", VERSAO, len(self), len(self.nomes)))
+            for nome in self.nomes:
+                nome = nome.encode()
+                f.write(_TAMANHO.pack(len(nome)))
+                f.write(nome)
+            for coluna in (self.instantes, self.valores, self.clientes, self.aceitos):
+                if sys.byteorder == "big":
+                    coluna = array.array(coluna.typecode, coluna)
+                    coluna.byteswap()
+                coluna.tofile(f)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def ler(cls, caminho):
+        historico = cls()
+        with open(caminho, "rb") as f:
+            assinatura, versao, linhas, clientes = _CABECALHO.unpack(f.read(_CABECALHO.size))
+            if assinatura != b"HIST" or versao != VERSAO:
+                raise ValueError(f"{caminho} não é um histórico v{VERSAO}")
+            for _ in range(clientes):
+                nome = f.read(_TAMANHO.unpack(f.read(_TAMANHO.size))[0]).decode()
+                historico.indices[nome] = len(historico.nomes)
+                historico.nomes.append(nome)
+            for coluna in (historico.instantes, historico.valores, historico.clientes, historico.aceitos):
+                coluna.fromfile(f, linhas)
+                if sys.byteorder == "big":
+                    coluna.byteswap()
+        return historico
+
+class Historico:
+    """Históricos em memória dos leilões em andamento de um validador."""
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        self.leiloes = {}  # id -> HistoricoLeilao
+        self.lock = threading.Lock()
+
+    def registrar(self, leilao_id, valor, cliente, aceito, instante=None):
+        with self.lock:
+            historico = self.leiloes.get(leilao_id)
+            if historico is None:
+                historico = self.leiloes[leilao_id] = HistoricoLeilao()
+            historico.adicionar(time.time() if instante is None else instante, valor, cliente, aceito)
+
+    def caminho(self, leilao_id):
+        return os.path.join(self.pasta, f"{leilao_id}.hist")
+
+    def buscar(self, leilao_id):
+        """Cópia do histórico do leilão, da memória ou do disco (None se não houver).
+
+        Em memória é devolvida uma cópia: o NumPy exporta o buffer dos arrays
+        durante a consulta, e um append concorrente no array exportado falharia.
+        """
+        with self.lock:
+            historico = self.leiloes.get(leilao_id)
+            if historico is not None:
+                return historico.copiar()
+        if os.path.exists(self.caminho(leilao_id)):
+            return HistoricoLeilao.ler(self.caminho(leilao_id))
+        return None
+
+    def gravar(self, leilao_id):
+        """Grava o histórico do leilão encerrado em disco e o tira da memória."""
+        with self.lock:
+            historico = self.leiloes.pop(leilao_id, None)
+        if historico is not None:
+            historico.gravar(self.caminho(leilao_id))
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python historico.py <arquivo.hist> [--intervalo 1]")
+        sys.exit(1)
+    intervalo = float(sys.argv[sys.argv.index("--intervalo") + 1]) if "--intervalo" in sys.argv else 1.0
+    historico = HistoricoLeilao.ler(sys.argv[1])
+
+    aceitos = sum(historico.aceitos)
+    print(f"{len(historico)} lances, {aceitos} aceitos, {len(historico.nomes)} clientes")
+    instantes, valores = historico.curva_preco()
+    if valores:
+        print(f"Preço: {valores[0]:.2f} -> {valores[-1]:.2f} em {instantes[-1] - instantes[0]:.1f} s")
+    taxas = [quantidade for _, quantidade in historico.taxa(intervalo)]
+    if taxas:
+        print(f"Lances por {intervalo:g} s: média {sum(taxas) / len(taxas):.1f}, pico {max(taxas)}")
+    print("Maiores lances:")
+    for cliente, valor, quantidade in historico.maiores_lances():
+        print(f"  {cliente:<20}{valor:>12.2f}{quantidade:>8} lances")
+
+if __name__ == "__main__":
+    main()
@@ -1,143 +1,370 @@
-import sys,os,pika,threading,datetime,json
-import base64
-from Crypto.Signature import pkcs1_15
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
+import sys,os,threading,time,heapq
+from concurrent.futures import ThreadPoolExecutor
+import codec
+import transporte
+import config
+import metricas
+from registro_chaves import RegistroChaves
+from consumo import preparar_consumo, preparar_publicacao, Coalescedor
+from conexao import exchange_atualizacoes, rota_atualizacoes
+from repositorio import Leilao, RepositorioLeiloes
+from persistencia import Diario
+from historico import Historico
 
-leiloes = []
+TAMANHO_LOTE = 64
+ESPERA_LOTE = 0.005  # segundos sem mensagens antes de processar um lote incompleto
 
+# Partição de leilões desta instância (--shard K, de LEILAO_SHARDS partições)
+shard = 0
+leiloes = RepositorioLeiloes()
+registro = RegistroChaves()
+esquemas_aceitos = config.esquemas_aceitos()
+diario = None
+historico = None
+# O modexp do PyCryptodome roda em C e solta o GIL, então threads bastam para usar
+# todos os núcleos e ainda compartilham o cache de chaves do registro.
+verificadores = ThreadPoolExecutor(max_workers=os.cpu_count())
 
-def main():
-    t1 = threading.Thread(target=adicionar_leiloes)
+RECEBIDOS = metricas.Contador("leilao_lances_recebidos_total", "Lances recebidos pelo validador")
+ACEITOS = metricas.Contador("leilao_lances_aceitos_total", "Lances aceitos (novo maior lance)")
+REJEITADOS = metricas.Contador("leilao_lances_rejeitados_total", "Lances rejeitados, por motivo", ("motivo",))
+REJEITADO_ASSINATURA = REJEITADOS.com("assinatura")
+REJEITADO_VALOR = REJEITADOS.com("valor")
+REJEITADO_FINALIZADO = REJEITADOS.com("finalizado")
+REJEITADO_DESCONHECIDO = REJEITADOS.com("leilao_desconhecido")
+VERIFICACAO = metricas.Histograma("leilao_verificacao_assinatura_segundos", "Tempo de verificação de uma assinatura")
+LOTE = metricas.Histograma("leilao_lote_lances_segundos", "Tempo para processar um lote de lances (verificação, WAL, publicação)")
+ATRASO_FILA = metricas.Histograma("leilao_atraso_fila_segundos", "Do envio pelo cliente até o validador receber o lance")
+
+
+def main(argv=None):
+    global shard
+    shard = config.ler_shard(sys.argv[1:] if argv is None else argv)
+    print(f"Validando a partição {shard} de {config.shards()}")
+    abrir_diario()
+    # Cada shard no seu endpoint: porta configurada + shard
+    porta = config.porta_metricas('lance')
+    metricas.servir(porta + shard if porta else 0)
+
+    t1 = threading.Thread(target=adicionar_leiloes, daemon=True)
     t1.start()
 
-    t2 = threading.Thread(target=escutar_lances)
+    t2 = threading.Thread(target=escutar_lances, daemon=True)
     t2.start()
 
-    t3 = threading.Thread(target=remover_leiloes)
+    t3 = threading.Thread(target=remover_leiloes, daemon=True)
     t3.start()
 
+    t4 = threading.Thread(target=escutar_rotacao_chaves, daemon=True)
+    t4.start()
+
+    t5 = threading.Thread(target=servir_catalogo, daemon=True)
+    t5.start()
+
     t1.join()
 
 def adicionar_leiloes():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
+    connection = transporte.conectar()
     channel = connection.channel()
     channel.exchange_declare(exchange='leilao', exchange_type='direct')
     result = channel.queue_declare(queue='', exclusive=True)
     queue_name = result.method.queue
     channel.queue_bind(exchange='leilao', queue=queue_name, routing_key='iniciar')
+    acks = preparar_consumo(channel, 'lance')
     
     def callback(ch, method, properties, body): 
-        global leiloes 
-        leilao = body.decode() 
-        print("Leilão recebido:", leilao)
-        obj = eval(leilao, {}) 
-        obj['valor'] = 0
-        leiloes.append(obj)
-
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
-    channel.start_consuming()
-
-def verificar_assinatura(valor, assinatura_b64, cliente):
-    try:
-        public_path = os.path.join("chaves", cliente, "public.pem")
+        registrar_leiloes(body)
+        acks.confirmar(method.delivery_tag)
 
-        with open(public_path, "rb") as f:
-            key = RSA.import_key(f.read())
+    channel.basic_consume(queue=queue_name, on_message_callback=callback)
+    channel.start_consuming()
 
-        h = SHA256.new(str(valor).encode())
+def abrir_diario():
+    """Restaura o estado da partição a partir do snapshot + WAL e passa a registrar nele."""
+    global diario, historico
+    if config.historico():
+        historico = Historico(os.path.join(config.pasta_dados(), f"historico_{shard}"))
+    diario = Diario(config.pasta_dados(), f"lance_{shard}", leiloes,
+                    intervalo_snapshot=config.intervalo_snapshot(), fsync=config.fsync_wal())
+    inicio = time.perf_counter()
+    restaurados = diario.restaurar()
+    print(f"{restaurados} leilões restaurados em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    diario.iniciar_snapshots()
 
-        assinatura = base64.b64decode(assinatura_b64)
+def registrar_leiloes(body):
+    with leiloes.lock:
+        for obj in codec.decodificar_todos(body):
+            if config.shard_de(obj['id']) != shard or leiloes.buscar(obj['id']) is not None:
+                continue
+            print("Leilão recebido:", obj)
+            leilao = leiloes.adicionar(Leilao(obj['id'], obj['descricao'], valor=0))
+            if diario is not None:
+                diario.registrar(leilao)
+        if diario is not None:
+            diario.sincronizar()
 
-        pkcs1_15.new(key).verify(h, assinatura)
+def verificar_assinatura(lance):
+    """Confere a assinatura da tupla (id, valor, nonce) com o esquema que o cliente declarou."""
+    if lance["esquema"] not in esquemas_aceitos or lance["nonce"] is None:
+        return False
+    inicio = time.perf_counter()
+    try:
+        verificador = registro.verificador(lance["cliente"], lance["esquema"])
+        verificador.verificar(lance["id"], lance["valor"], lance["nonce"], lance["assinatura"])
         return True
     except (ValueError, TypeError, FileNotFoundError):
         return False
+    finally:
+        VERIFICACAO.observar(time.perf_counter() - inicio)
+
+def verificar_lote(lances):
+    """Verifica as assinaturas de um lote de lances em paralelo, preservando a ordem."""
+    return list(verificadores.map(verificar_assinatura, lances))
+
+def processar_lance(lance, assinatura_ok):
+    """Aplica um lance já verificado e retorna a mensagem para lance_validado (None se o leilão não existe)."""
+    leilao_id = lance['id']
+    RECEBIDOS.inc()
+
+    # O lock evita que um lance seja aceito no meio do encerramento do leilão
+    with leiloes.lock:
+        leilao = leiloes.buscar(leilao_id)
+
+        if leilao is None:
+            REJEITADO_DESCONHECIDO.inc()
+            return None
+
+        status = leilao.status
+        aceito = False
+
+        if not assinatura_ok:
+            REJEITADO_ASSINATURA.inc()
+        elif status == 'finalizado':
+            REJEITADO_FINALIZADO.inc()
+        elif not lance['valor'] > leilao.valor:
+            REJEITADO_VALOR.inc()
+        else:
+            aceito = True
+            ACEITOS.inc()
+            leilao.valor = lance['valor']
+            leilao.cliente = lance['cliente']
+            if diario is not None:
+                diario.registrar(leilao)
+
+        # O histórico de um leilão finalizado já foi para o disco
+        if historico is not None and status != 'finalizado':
+            historico.registrar(leilao_id, lance['valor'], lance['cliente'], aceito)
+
+        return codec.codificar("lance_validado", {"id": leilao_id, "valor": leilao.valor, "cliente": leilao.cliente, "status": status})
+
+def processar_encerramento(body):
+    """Finaliza o leilão e retorna a mensagem para leilao_vencedor (None se o leilão não existe)."""
+    leilao_final = codec.decodificar(body)
+    leilao_id = leilao_final['id']
+
+    with leiloes.lock:
+        leilao = leiloes.buscar(leilao_id)
+        if not leilao:
+            return None
+
+        mensagem = {
+            "id": leilao_id,
+            "vencedor": leilao.cliente,
+            "valor": leilao.valor
+        }
+        leiloes.atualizar_status(leilao, 'finalizado')
+        if diario is not None:
+            diario.registrar(leilao)
+            diario.sincronizar()
+
+    if historico is not None:
+        historico.gravar(leilao_id)
+
+    return codec.codificar("vencedor", mensagem)
+
+def descartar_leilao(leilao_id):
+    """Tira o leilão finalizado da memória (e dos snapshots) depois que o vencedor foi publicado.
+
+    Lances que ainda chegarem para ele passam a ser rejeitados como de leilão desconhecido.
+    """
+    with leiloes.lock:
+        leilao = leiloes.remover(leilao_id)
+        if leilao is not None and diario is not None:
+            diario.remover(leilao)
+            diario.sincronizar()
+
+def pagina_catalogo(apos, limite):
+    """Lote [pagina_catalogo, estado, ...] com até `limite` leilões ativos de id > `apos`.
+
+    `proximo` na pagina_catalogo é o cursor da página seguinte (None na última).
+    """
+    limite = min(limite or config.tamanho_pagina_catalogo(), config.tamanho_pagina_catalogo())
+    with leiloes.lock:
+        ativos = leiloes.com_status('ativo')
+        if apos is not None:
+            ativos = [leilao for leilao in ativos if leilao.id > apos]
+        pagina = heapq.nsmallest(limite + 1, ativos, key=lambda leilao: leilao.id)
+        itens = [codec.codificar("estado", {
+            "id": leilao.id,
+            "descricao": leilao.descricao,
+            # Sem lance ainda, o valor inicial (0) não é um valor de verdade
+            "valor": leilao.valor if leilao.cliente is not None else None,
+            "cliente": leilao.cliente,
+            "status": leilao.status
+        }) for leilao in pagina[:limite]]
+
+    proximo = pagina[limite - 1].id if len(pagina) > limite else None
+    return codec.codificar_lote([codec.codificar("pagina_catalogo", {"proximo": proximo})] + itens)
+
+def processar_rotacao(body):
+    cliente = codec.decodificar(body)['cliente']
+    registro.invalidar(cliente)
+    print("Chave rotacionada:", cliente, registro.estatisticas())
+
+def publicar_validado(channel, resposta):
+    channel.basic_publish(
+        exchange='lance_validado',
+        routing_key='publicar',
+        body=resposta,
+        properties=codec.PROPRIEDADES
+    )
+
+def coalescedor_direto(channel):
+    """No modo direto os lances validados vão para leilao.<id>, sem o repasse do
+    notificacao.py, e a janela de coalescência é aplicada aqui."""
+    exchange = exchange_atualizacoes()[0]
+
+    def publicar(leilao_id, body):
+        # Sob o lock, para não sair depois do encerramento: o aviso de finalizado
+        # do notificacao.py já leva o vencedor
+        with leiloes.lock:
+            leilao = leiloes.buscar(leilao_id)
+            if leilao is None or leilao.status == 'finalizado':
+                return
+            channel.basic_publish(
+                exchange=exchange,
+                routing_key=rota_atualizacoes(leilao_id),
+                body=body,
+                properties=codec.PROPRIEDADES
+            )
+
+    return Coalescedor(channel.connection, publicar, config.janela_coalescencia('lance'))
 
 def escutar_lances():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
+    connection = transporte.conectar()
     channel = connection.channel()
     channel.exchange_declare(exchange='lance_validado', exchange_type='direct')
+    nome, tipo = exchange_atualizacoes()
+    channel.exchange_declare(exchange=nome, exchange_type=tipo)
     channel.exchange_declare(exchange='lance', exchange_type='direct')
     result = channel.queue_declare(queue='', exclusive=True)
     queue_name = result.method.queue
-    channel.queue_bind(exchange='lance', queue=queue_name, routing_key='publicar')
-
-    def callback(ch, method, properties, body):
-        lance = json.loads(body.decode())
-        leilao_id = lance['id']
-
-        leilao_idx = next((idx for idx, l in enumerate(leiloes) if l['id'] == leilao_id), None)
-
-        assinatura_ok = verificar_assinatura(lance["valor"], lance["assinatura"], lance["cliente"])
-        
-        if leilao_idx is None:
-            return
-        
-        leilao = leiloes[leilao_idx]
-
-        status = leilao.get('status', 'ativo')
-        cliente = leilao.get('cliente', '-')
-        valor = leilao.get('valor', '-')
+    channel.queue_bind(exchange='lance', queue=queue_name, routing_key=f'publicar.{shard}')
+    acks = preparar_consumo(channel, 'lance')
+    preparar_publicacao(channel, 'lance')
+    coalescedor = coalescedor_direto(channel) if config.notificacao_direta() else None
 
-        if(lance['valor'] > leilao['valor'] and status != 'finalizado' and assinatura_ok):
-            leilao['valor'] = lance['valor']
-            leilao['cliente'] = lance['cliente']
-        else:
-            leilao['valor'] = valor
-            leilao['cliente'] = cliente
-            leilao['status'] = status
+    # Junta até TAMANHO_LOTE lances (ou o que chegou até a fila ficar ociosa por
+    # ESPERA_LOTE segundos), verifica as assinaturas em paralelo e só então aplica
+    # os lances um a um, na ordem de chegada. O lote vai para o WAL antes de ser
+    # publicado em lance_validado, e só é confirmado ao broker depois disso.
+    lote = []
+    tags = []
+    for method, properties, body in channel.consume(queue_name, inactivity_timeout=ESPERA_LOTE):
+        if method is not None:
+            atraso = codec.atraso_fila(properties)
+            if atraso is not None:
+                ATRASO_FILA.observar(atraso)
+            lote.append(codec.decodificar(body))
+            tags.append(method.delivery_tag)
+            if len(lote) < TAMANHO_LOTE:
+                continue
 
-        if(status == 'finalizado'):
-            leilao['status'] = 'finalizado'
+        if not lote:
+            continue
 
-        channel.basic_publish(
-            exchange='lance_validado',
-            routing_key='publicar',
-            body=str({"id": leilao_id, "valor": leilao['valor'], "cliente": leilao['cliente'], "status": status})
-        )
+        inicio = time.perf_counter()
+        assinaturas = verificar_lote(lote)
+        respostas = [processar_lance(lance, assinatura_ok) for lance, assinatura_ok in zip(lote, assinaturas)]
+        if diario is not None:
+            diario.sincronizar()
 
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
-    channel.start_consuming()
+        for resposta, tag in zip(respostas, tags):
+            if resposta is not None:
+                if coalescedor is not None:
+                    coalescedor.adicionar(codec.ler_id(resposta), resposta)
+                else:
+                    publicar_validado(channel, resposta)
+            acks.confirmar(tag)
+        acks.descarregar()
+        LOTE.observar(time.perf_counter() - inicio)
+        lote = []
+        tags = []
 
 def remover_leiloes():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
+    connection = transporte.conectar()
     channel = connection.channel()
     channel.exchange_declare(exchange='leilao', exchange_type='direct')
     result = channel.queue_declare(queue='', exclusive=True)
     queue_name = result.method.queue
     channel.queue_bind(exchange='leilao', queue=queue_name, routing_key='encerrar')
+    acks = preparar_consumo(channel, 'lance')
+    preparar_publicacao(channel, 'lance')
 
     def callback(ch, method, properties, body):
-        global leiloes
-        leilao_final = eval(body.decode(), {"datetime": datetime}) 
-        leilao_id = leilao_final['id']
+        resposta = processar_encerramento(body)
+        if resposta is not None:
+            ch.basic_publish(
+                exchange="leilao",
+                routing_key="leilao_vencedor",
+                body=resposta,
+                properties=codec.PROPRIEDADES
+            )
+            descartar_leilao(codec.ler_id(resposta))
+        acks.confirmar(method.delivery_tag)
 
-        leilao = next((l for l in leiloes if l['id'] == leilao_id), None)
-        if not leilao:
-            return
+    channel.basic_consume(queue=queue_name, on_message_callback=callback)
+    channel.start_consuming()
 
-        vencedor = leilao.get('cliente', None)
-        valor_final = leilao.get('valor', 0)
+def escutar_rotacao_chaves():
+    connection = transporte.conectar()
+    channel = connection.channel()
+    channel.exchange_declare(exchange='lance', exchange_type='direct')
+    result = channel.queue_declare(queue='', exclusive=True)
+    queue_name = result.method.queue
+    channel.queue_bind(exchange='lance', queue=queue_name, routing_key='rotacionar_chave')
+    acks = preparar_consumo(channel, 'lance')
 
-        mensagem = {
-            "id": leilao_id,
-            "vencedor": vencedor,
-            "valor": valor_final
-        }
+    def callback(ch, method, properties, body):
+        processar_rotacao(body)
+        acks.confirmar(method.delivery_tag)
 
-        ch.basic_publish(
-            exchange="leilao",
-            routing_key="leilao_vencedor",
-            body=str(mensagem).encode()
-        )
+    channel.basic_consume(queue=queue_name, on_message_callback=callback)
+    channel.start_consuming()
 
-        leilao['status'] = 'finalizado'
+def servir_catalogo():
+    # Responde consultas de catálogo (RPC): a resposta vai pela exchange padrão
+    # para a fila em reply_to, com o mesmo correlation_id do pedido
+    connection = transporte.conectar()
+    channel = connection.channel()
+    channel.exchange_declare(exchange='lance', exchange_type='direct')
+    result = channel.queue_declare(queue='', exclusive=True)
+    queue_name = result.method.queue
+    channel.queue_bind(exchange='lance', queue=queue_name, routing_key=f'catalogo.{shard}')
+    acks = preparar_consumo(channel, 'lance')
+
+    def callback(ch, method, properties, body):
+        consulta = codec.decodificar(body)
+        if properties.reply_to:
+            ch.basic_publish(
+                exchange='',
+                routing_key=properties.reply_to,
+                body=pagina_catalogo(consulta['apos'], consulta['limite']),
+                properties=codec.propriedades_rpc(properties.correlation_id)
+            )
+        acks.confirmar(method.delivery_tag)
 
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
+    channel.basic_consume(queue=queue_name, on_message_callback=callback)
     channel.start_consuming()
 
 if __name__ == "__main__":
@@ -148,4 +375,4 @@ if __name__ == "__main__":
         try:
             sys.exit(0)
         except SystemExit:
-            os._exit(0)
\ No newline at end of file
+            os._exit(0)
@@ -0,0 +1,176 @@
+"""Validador de lances em asyncio (aio-pika), com a mesma lógica do lance.py.
+
+Uso: python lance_async.py [--shard K]
+"""
+import asyncio, sys, os, time
+import aio_pika
+import codec
+import config
+import lance
+import metricas
+from conexao import EXCHANGE_TOPICO, rota_atualizacoes
+
+class AckEmLote:
+    """Versão asyncio do consumo.AckEmLote."""
+
+    def __init__(self, tamanho, intervalo=0.2):
+        self.tamanho = tamanho
+        self.ultima = None
+        self.pendentes = 0
+        self.lock = asyncio.Lock()
+        self.timer = asyncio.create_task(self._timer(intervalo))
+
+    async def confirmar(self, msg):
+        self.ultima = msg
+        self.pendentes += 1
+        if self.pendentes >= self.tamanho:
+            await self.descarregar()
+
+    async def descarregar(self):
+        # O timer e confirmar() podem descarregar ao mesmo tempo; as mensagens
+        # confirmadas durante o await ficam para o próximo descarregar
+        async with self.lock:
+            if not self.pendentes:
+                return
+            ultima, self.pendentes = self.ultima, 0
+            await ultima.ack(multiple=True)
+
+    async def _timer(self, intervalo):
+        while True:
+            await asyncio.sleep(intervalo)
+            await self.descarregar()
+
+def mensagem(body):
+    return aio_pika.Message(body, content_type=codec.CONTENT_TYPE)
+
+async def abrir_canal(connection):
+    channel = await connection.channel(publisher_confirms=config.confirmar_publicacoes('lance'))
+    await channel.set_qos(prefetch_count=config.prefetch('lance'))
+    acks = AckEmLote(max(1, min(config.ack_lote('lance'), config.prefetch('lance'))))
+    return channel, acks
+
+async def fila_exclusiva(channel, exchange, routing_key):
+    exchange = await channel.declare_exchange(exchange, aio_pika.ExchangeType.DIRECT)
+    queue = await channel.declare_queue(exclusive=True)
+    await queue.bind(exchange, routing_key=routing_key)
+    return queue
+
+async def consumir(connection, exchange, routing_key, processar):
+    """Consumidor simples: processar(channel, body) é uma corrotina.
+
+    Usa o iterador da fila para processar uma mensagem por vez, na ordem de
+    entrega, que é o que o ack múltiplo exige.
+    """
+    channel, acks = await abrir_canal(connection)
+    queue = await fila_exclusiva(channel, exchange, routing_key)
+
+    async with queue.iterator() as mensagens:
+        async for msg in mensagens:
+            await processar(channel, msg.body)
+            await acks.confirmar(msg)
+
+async def escutar_lances(connection):
+    channel, acks = await abrir_canal(connection)
+    queue = await fila_exclusiva(channel, 'lance', f'publicar.{lance.shard}')
+    if config.notificacao_direta():
+        exchange_validado = await channel.declare_exchange(EXCHANGE_TOPICO, aio_pika.ExchangeType.TOPIC)
+    else:
+        exchange_validado = await channel.declare_exchange('lance_validado', aio_pika.ExchangeType.DIRECT)
+    loop = asyncio.get_running_loop()
+    pendentes = asyncio.Queue(maxsize=config.prefetch('lance'))
+
+    async def aplicar():
+        # Aplica os lances na ordem de chegada, esperando cada verificação. O que
+        # já está na fila entra no mesmo lote, com um só flush do WAL, como no lance.py
+        while True:
+            lote = [await pendentes.get()]
+            while not pendentes.empty():
+                lote.append(pendentes.get_nowait())
+
+            inicio = time.perf_counter()
+            respostas = []
+            for msg, dados, verificacao in lote:
+                try:
+                    respostas.append(lance.processar_lance(dados, await verificacao))
+                except Exception as e:
+                    print(f"Erro ao aplicar lance do leilão {dados.get('id')}: {e!r}")
+                    respostas.append(None)
+            lance.diario.sincronizar()
+
+            for (msg, dados, _), resposta in zip(lote, respostas):
+                if resposta is not None:
+                    rota = rota_atualizacoes(dados['id']) if config.notificacao_direta() else 'publicar'
+                    try:
+                        await exchange_validado.publish(mensagem(resposta), routing_key=rota)
+                    except Exception as e:
+                        print(f"Erro ao publicar lance do leilão {dados['id']}: {e!r}")
+                await acks.confirmar(msg)
+            lance.LOTE.observar(time.perf_counter() - inicio)
+
+    async def receber():
+        async with queue.iterator() as mensagens:
+            async for msg in mensagens:
+                atraso = codec.atraso_fila(msg)
+                if atraso is not None:
+                    lance.ATRASO_FILA.observar(atraso)
+                dados = codec.decodificar(msg.body)
+                # A verificação já começa aqui, em paralelo com as dos lances seguintes
+                verificacao = loop.run_in_executor(lance.verificadores, lance.verificar_assinatura, dados)
+                await pendentes.put((msg, dados, verificacao))
+
+    # Juntas: se o aplicador parar, o erro sobe em vez de receber() ficar
+    # preso para sempre em pendentes.put() com a fila cheia
+    await asyncio.gather(receber(), aplicar())
+
+async def ao_iniciar(channel, body):
+    lance.registrar_leiloes(body)
+
+async def ao_encerrar(channel, body):
+    resposta = lance.processar_encerramento(body)
+    if resposta is not None:
+        exchange = await channel.get_exchange('leilao', ensure=False)
+        await exchange.publish(mensagem(resposta), routing_key='leilao_vencedor')
+        lance.descartar_leilao(codec.ler_id(resposta))
+
+async def ao_rotacionar(channel, body):
+    lance.processar_rotacao(body)
+
+async def servir_catalogo(connection):
+    # Mesmo protocolo de lance.servir_catalogo
+    channel, acks = await abrir_canal(connection)
+    queue = await fila_exclusiva(channel, 'lance', f'catalogo.{lance.shard}')
+
+    async with queue.iterator() as mensagens:
+        async for msg in mensagens:
+            consulta = codec.decodificar(msg.body)
+            if msg.reply_to:
+                resposta = aio_pika.Message(lance.pagina_catalogo(consulta['apos'], consulta['limite']),
+                                            content_type=codec.CONTENT_TYPE,
+                                            correlation_id=msg.correlation_id)
+                await channel.default_exchange.publish(resposta, routing_key=msg.reply_to)
+            await acks.confirmar(msg)
+
+async def main():
+    lance.shard = config.ler_shard(sys.argv)
+    lance.abrir_diario()
+    # Os contadores são os do lance.py; o endpoint segue a mesma regra (porta + shard)
+    porta = config.porta_metricas('lance')
+    metricas.servir(porta + lance.shard if porta else 0)
+    connection = await aio_pika.connect_robust(host=config.host())
+    async with connection:
+        await asyncio.gather(
+            consumir(connection, 'leilao', 'iniciar', ao_iniciar),
+            consumir(connection, 'leilao', 'encerrar', ao_encerrar),
+            consumir(connection, 'lance', 'rotacionar_chave', ao_rotacionar),
+            escutar_lances(connection),
+            servir_catalogo(connection))
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print('Interrupted')
+        try:
+            sys.exit(0)
+        except SystemExit:
+            os._exit(0)
@@ -1,10 +1,28 @@
 from datetime import datetime, timedelta
-import time
-import pika
 import os
 import sys
+import threading
+from repositorio import Leilao, RepositorioLeiloes
+import codec
+import config
+import metricas
+import transporte
+from consumo import preparar_consumo
+import fonte_leiloes
+from agendador import Agendador
 
-leiloes = [
+# Só os leilões que começam dentro desse horizonte ficam em memória/agendados
+HORIZONTE = timedelta(minutes=5)
+TAMANHO_LOTE_INICIAR = 500
+
+leiloes = RepositorioLeiloes()
+inicios_pendentes = []
+
+ATRASO_AGENDADOR = metricas.Histograma("leilao_agendador_atraso_segundos", "Atraso de cada evento do agendador em relação ao prazo")
+INICIADOS = metricas.Contador("leilao_leiloes_iniciados_total", "Leilões iniciados")
+FINALIZADOS = metricas.Contador("leilao_leiloes_finalizados_total", "Leilões encerrados")
+
+exemplos = [
     {
         "id": 0,
         "descricao": "Playstation 5",
@@ -42,49 +60,126 @@ leiloes = [
     }
 ]
 
-def main():
-    channel = iniciarConexao()
+def main(argv=None):
+    # Uso: python leilao.py [leiloes.csv|leiloes.jsonl] [--controle]
+    argv = sys.argv[1:] if argv is None else argv
+    arquivos = [arg for arg in argv if not arg.startswith("--")]
+    controle = "--controle" in argv
 
-    while True:
-        agora = datetime.now()
-        for leilao in leiloes:
-            if leilao["status"] == "aguardando inicio" and agora >= leilao["inicio"]:
-                iniciarLeilao(channel, leilao)
+    if arquivos:
+        fonte = fonte_leiloes.ler_arquivo(arquivos[0])
+    else:
+        fonte = (Leilao(**leilao) for leilao in sorted(exemplos, key=lambda l: l["inicio"]))
 
-            if leilao["status"] == "ativo" and agora >= leilao["fim"]:
-                finalizarLeilao(channel, leilao)
+    metricas.servir(config.porta_metricas('leilao'))
+    channel = iniciarConexao()
+    agendador = Agendador(atraso=ATRASO_AGENDADOR)
+
+    alimentar(agendador, channel, fonte)
 
-        if all(l["status"] == "encerrado" for l in leiloes):
-            break
+    if controle:
+        t = threading.Thread(target=escutar_cadastros, args=(agendador, channel), daemon=True)
+        t.start()
 
-        time.sleep(1)
+    # Sem a fila de controle, termina quando não houver mais inícios nem fins agendados
+    agendador.executar(
+        ocioso=lambda: channel.connection.process_data_events(time_limit=0),
+        parar_quando_vazio=not controle)
     
     channel.close()
 
+def alimentar(agendador, channel, fonte, proximo=None):
+    """Agenda os leilões da fonte que começam dentro do HORIZONTE e se reagenda
+    para quando o próximo leilão da fonte entrar no horizonte."""
+    limite = datetime.now() + HORIZONTE
+    leilao = proximo or next(fonte, None)
+    while leilao is not None and leilao.inicio <= limite:
+        leiloes.adicionar(leilao)
+        agendarLeilao(agendador, channel, leilao)
+        leilao = next(fonte, None)
+
+    if leilao is not None:
+        agendador.agendar(leilao.inicio - HORIZONTE, alimentar, agendador, channel, fonte, leilao)
+
+def escutar_cadastros(agendador, channel):
+    # Recebe leilões novos com o sistema rodando; `channel` é o canal de publicação
+    # usado pelas ações do agendador, que rodam na thread principal.
+    connection = transporte.conectar()
+    canal = connection.channel()
+    canal.exchange_declare(exchange='leilao', exchange_type='direct')
+    result = canal.queue_declare(queue='', exclusive=True)
+    queue_name = result.method.queue
+    canal.queue_bind(exchange='leilao', queue=queue_name, routing_key='cadastrar')
+    acks = preparar_consumo(canal, 'leilao')
+
+    def callback(ch, method, properties, body):
+        for obj in codec.decodificar_todos(body):
+            leilao = Leilao(obj['id'], obj['descricao'], obj['inicio'], obj['fim'], status="aguardando inicio")
+            print("Leilão cadastrado:", leilao.descricao)
+            leiloes.adicionar(leilao)
+            agendarLeilao(agendador, channel, leilao)
+        acks.confirmar(method.delivery_tag)
+
+    canal.basic_consume(queue=queue_name, on_message_callback=callback)
+    canal.start_consuming()
+
 def iniciarConexao():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
+    connection = transporte.conectar()
     channel = connection.channel()
     channel.exchange_declare(exchange='leilao', exchange_type='direct')
     return channel
 
-def iniciarLeilao(channel, leilao):
-    print("Iniciando leilão:", leilao["descricao"])
-    leilao["status"] = "ativo"
+def agendarLeilao(agendador, channel, leilao):
+    agendador.agendar(leilao.inicio, iniciarLeilao, agendador, channel, leilao)
+    # Com fim <= inicio o encerramento sai logo depois do início (no mesmo
+    # instante, os eventos rodam na ordem de agendamento), não antes dele
+    agendador.agendar(max(leilao.inicio, leilao.fim), finalizarLeilao, channel, leilao)
+
+def iniciarLeilao(agendador, channel, leilao):
+    print("Iniciando leilão:", leilao.descricao)
+    INICIADOS.inc()
+    leiloes.atualizar_status(leilao, "ativo")
+    inicios_pendentes.append(codec.codificar("iniciar", {"id": leilao.id, "descricao": leilao.descricao}))
+
+    # Leilões que começam juntos saem numa única mensagem: o envio é agendado para
+    # "agora", então roda depois dos outros eventos que já estavam vencidos.
+    if len(inicios_pendentes) == 1:
+        agendador.agendar(datetime.now(), publicarInicios, channel)
+    elif len(inicios_pendentes) >= TAMANHO_LOTE_INICIAR:
+        publicarInicios(channel)
+
+def publicarInicios(channel):
+    if not inicios_pendentes:
+        return
+
+    if len(inicios_pendentes) == 1:
+        body = inicios_pendentes[0]
+    else:
+        body = codec.codificar_lote(inicios_pendentes)
+
     channel.basic_publish(
         exchange='leilao',
         routing_key='iniciar',
-        body=str({"id": leilao["id"], "descricao": leilao["descricao"]})
+        body=body,
+        properties=codec.PROPRIEDADES
     )
+    inicios_pendentes.clear()
 
 def finalizarLeilao(channel, leilao):
-    print("Leilão finalizado:", leilao["descricao"])
-    leilao["status"] = "encerrado"
+    if leilao.status != "ativo":
+        return
+    # O início precisa chegar aos consumidores antes do encerramento
+    publicarInicios(channel)
+    print("Leilão finalizado:", leilao.descricao)
+    FINALIZADOS.inc()
+    leiloes.atualizar_status(leilao, "encerrado")
     channel.basic_publish(
         exchange='leilao',
         routing_key='encerrar',
-        body=str(leilao)
+        body=codec.codificar("encerrar", leilao.para_dict()),
+        properties=codec.PROPRIEDADES
     )
+    leiloes.remover(leilao.id)
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,148 @@
+"""Métricas dos serviços no formato de texto do Prometheus, em /metrics."""
+import bisect, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos baldes em segundos, de 100 µs a 10 s
+LIMITES_TEMPO = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metricas = []
+_lock = threading.Lock()
+
+class _Serie:
+    """Valor de um contador para uma combinação de rótulos."""
+
+    def __init__(self):
+        self.valor = 0
+        self.lock = threading.Lock()
+
+    def inc(self, valor=1):
+        with self.lock:
+            self.valor += valor
+
+    def linhas(self, nome, rotulos):
+        return [f"{nome}{rotulos} {self.valor}"]
+
+class _SerieHistograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.baldes = [0] * (len(limites) + 1)  # o último é o +Inf
+        self.soma = 0.0
+        self.contagem = 0
+        self.lock = threading.Lock()
+
+    def observar(self, valor):
+        i = bisect.bisect_left(self.limites, valor)
+        with self.lock:
+            self.baldes[i] += 1
+            self.soma += valor
+            self.contagem += 1
+
+    def linhas(self, nome, rotulos):
+        with self.lock:
+            baldes, soma, contagem = list(self.baldes), self.soma, self.contagem
+        linhas = []
+        acumulado = 0
+        for limite, quantidade in zip(list(self.limites) + ["+Inf"], baldes):
+            acumulado += quantidade
+            linhas.append(f'{nome}_bucket{_rotulos(rotulos, le=limite)} {acumulado}')
+        linhas.append(f"{nome}_sum{rotulos} {soma}")
+        linhas.append(f"{nome}_count{rotulos} {contagem}")
+        return linhas
+
+def _rotulos(texto, **extra):
+    """Acrescenta rótulos a um texto de rótulos já formatado ('' ou '{a="b"}')."""
+    pares = ",".join(f'{chave}="{valor}"' for chave, valor in extra.items())
+    if not texto:
+        return "{" + pares + "}"
+    return texto[:-1] + "," + pares + "}"
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.series = {}  # valores dos rótulos -> série
+        self.lock = threading.Lock()
+        if not self.rotulos:
+            # Sem rótulos, a série aparece zerada desde o início
+            self.com()
+        with _lock:
+            _metricas.append(self)
+
+    def com(self, *valores):
+        """Série desta métrica para os valores de rótulo dados."""
+        serie = self.series.get(valores)
+        if serie is None:
+            if len(valores) != len(self.rotulos):
+                raise ValueError(f"{self.nome} espera os rótulos {self.rotulos}")
+            with self.lock:
+                serie = self.series.setdefault(valores, self._nova_serie())
+        return serie
+
+    def linhas(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        for valores, serie in list(self.series.items()):
+            rotulos = ""
+            if valores:
+                rotulos = "{" + ",".join(f'{nome}="{valor}"' for nome, valor in zip(self.rotulos, valores)) + "}"
+            linhas.extend(serie.linhas(self.nome, rotulos))
+        return linhas
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def _nova_serie(self):
+        return _Serie()
+
+    def inc(self, valor=1):
+        self.com().inc(valor)
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_TEMPO):
+        self.limites = tuple(limites)
+        super().__init__(nome, ajuda, rotulos)
+
+    def _nova_serie(self):
+        return _SerieHistograma(self.limites)
+
+    def observar(self, valor):
+        self.com().observar(valor)
+
+def texto():
+    """Todas as métricas do processo no formato de exposição do Prometheus."""
+    with _lock:
+        metricas = list(_metricas)
+    linhas = []
+    for metrica in metricas:
+        linhas.extend(metrica.linhas())
+    return "\n".join(linhas) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = texto().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+def servir(porta, host="localhost"):
+    """Sobe o endpoint /metrics numa thread daemon; porta 0 não faz nada."""
+    if not porta:
+        return None
+    servidor = ThreadingHTTPServer((host, porta), _Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    print(f"Métricas em http://{host}:{porta}/metrics")
+    return servidor
@@ -1,56 +1,113 @@
-import sys, os, pika, threading
+import sys, os, time
+from collections import OrderedDict
+import codec
+import config
+import metricas
+import transporte
+from consumo import preparar_consumo, preparar_publicacao, Coalescedor
+from conexao import exchange_atualizacoes, rota_atualizacoes
+
+RECEBIDAS = metricas.Contador("leilao_notificacoes_recebidas_total", "Lances validados recebidos para repasse")
+PUBLICADAS = metricas.Contador("leilao_notificacoes_publicadas_total", "Atualizações publicadas para os clientes")
+FINALIZADOS = metricas.Contador("leilao_notificacoes_finalizados_total", "Avisos de leilão finalizado publicados")
+ATRASADAS = metricas.Contador("leilao_notificacoes_atrasadas_total", "Lances validados descartados por chegarem depois do aviso de finalizado")
+CALLBACK = metricas.Histograma("leilao_notificacao_callback_segundos", "Duração dos callbacks do notificacao.py", ("consumidor",))
+CALLBACK_LANCES = CALLBACK.com("lances")
+CALLBACK_VENCEDOR = CALLBACK.com("vencedor")
+
+# Segundos que um leilão finalizado continua barrando lances atrasados
+CARENCIA_FINALIZADOS = 60
 
 def main():
-    t1 = threading.Thread(target=escuta_lances)
-    t1.start()
+    metricas.servir(config.porta_metricas('notificacao'))
+
+    # Os dois consumidores ficam na mesma conexão (e thread) que o coalescedor,
+    # para o aviso de finalizado nunca ser ultrapassado por um lance que estava
+    # esperando a janela
+    connection = transporte.conectar()
+    publicacao = connection.channel()
+    exchange, tipo = exchange_atualizacoes()
+    publicacao.exchange_declare(exchange=exchange, exchange_type=tipo)
+    preparar_publicacao(publicacao, 'notificacao')
+
+    def publicar(leilao_id, body):
+        PUBLICADAS.inc()
+        publicacao.basic_publish(
+            exchange=exchange,
+            routing_key=rota_atualizacoes(leilao_id),
+            body=body,
+            properties=codec.PROPRIEDADES
+        )
 
-    t2 = threading.Thread(target=finaliza_leilao)
-    t2.start()
+    coalescedor = Coalescedor(connection, publicar, config.janela_coalescencia('notificacao'))
+    # Leilões cujo aviso de finalizado já saiu. O lance.py publica as respostas
+    # de um lote só depois de processá-lo inteiro, então um lance 'ativo' pode
+    # chegar depois do vencedor e faria o cliente voltar o leilão para ativo.
+    # id -> instante do aviso, em ordem de finalização
+    finalizados = OrderedDict()
 
-    t1.join()
+    # No modo direto o lance.py já publica os lances validados em leilao.<id>;
+    # aqui sobra só o aviso de leilão finalizado
+    if not config.notificacao_direta():
+        escuta_lances(connection, coalescedor, finalizados)
+    finaliza_leilao(connection, coalescedor, finalizados)
 
-def escuta_lances():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
+    while True:
+        connection.process_data_events(time_limit=None)
+
+def escuta_lances(connection, coalescedor, finalizados):
     channel = connection.channel()
     channel.exchange_declare(exchange='lance_validado', exchange_type='direct')
     result = channel.queue_declare(queue='', exclusive=True)
     queue_name = result.method.queue
     channel.queue_bind(exchange='lance_validado', queue=queue_name, routing_key='publicar')
+    acks = preparar_consumo(channel, 'notificacao')
 
     def callback(ch, method, properties, body):
-        lance = eval(body.decode())
-        ch.exchange_declare(exchange='leilao', exchange_type='direct')
-        ch.basic_publish(
-            exchange='leilao',
-            routing_key='leilao_{}'.format(lance['id']),
-            body=str(lance).encode()
-        )
+        inicio = time.perf_counter()
+        RECEBIDAS.inc()
+        # Repassa os bytes como chegaram; só o id é lido para montar a routing key
+        leilao_id = codec.ler_id(body)
+        if leilao_id in finalizados:
+            ATRASADAS.inc()
+        else:
+            coalescedor.adicionar(leilao_id, body)
+            print('leilao_{}'.format(leilao_id))
+        acks.confirmar(method.delivery_tag)
+        CALLBACK_LANCES.observar(time.perf_counter() - inicio)
 
-        print('leilao_{}'.format(lance['id']))
+    channel.basic_consume(queue=queue_name, on_message_callback=callback)
 
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
-    channel.start_consuming()
-
-def finaliza_leilao():
-    connection = pika.BlockingConnection(
-    pika.ConnectionParameters(host='localhost'))
+def finaliza_leilao(connection, coalescedor, finalizados):
     channel = connection.channel()
     channel.exchange_declare(exchange='leilao', exchange_type='direct')
     result = channel.queue_declare(queue='', exclusive=True)
     queue_name = result.method.queue
     channel.queue_bind(exchange='leilao', queue=queue_name, routing_key='leilao_vencedor')
+    acks = preparar_consumo(channel, 'notificacao')
 
     def callback(ch, method, properties, body):
-        vencedor_info = eval(body.decode())
-        ch.basic_publish(
-            exchange='leilao',
-            routing_key='leilao_{}'.format(vencedor_info['id']),
-            body=str({"status": "finalizado"}).encode()
-        )
+        inicio = time.perf_counter()
+        vencedor_info = codec.decodificar(body)
+        agora = time.monotonic()
+        finalizados[vencedor_info['id']] = agora
+        finalizados.move_to_end(vencedor_info['id'])
+        # Depois da carência nenhum lance do leilão ainda está a caminho
+        while next(iter(finalizados.values())) < agora - CARENCIA_FINALIZADOS:
+            finalizados.popitem(last=False)
+        # O aviso final leva o lance vencedor, então a atualização pendente pode ser descartada
+        coalescedor.descartar(vencedor_info['id'])
+        coalescedor.publicar(vencedor_info['id'], codec.codificar("lance_validado", {
+            "id": vencedor_info['id'],
+            "valor": vencedor_info['valor'],
+            "cliente": vencedor_info['vencedor'],
+            "status": "finalizado"
+        }))
+        FINALIZADOS.inc()
+        acks.confirmar(method.delivery_tag)
+        CALLBACK_VENCEDOR.observar(time.perf_counter() - inicio)
 
-    channel.basic_consume(queue=queue_name, on_message_callback=callback, auto_ack=True)
-    channel.start_consuming()
+    channel.basic_consume(queue=queue_name, on_message_callback=callback)
 
 if __name__ == "__main__":
     try:
@@ -60,4 +117,4 @@ if __name__ == "__main__":
         try:
             sys.exit(0)
         except SystemExit:
-            os._exit(0)
\ No newline at end of file
+            os._exit(0)
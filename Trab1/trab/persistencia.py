@@ -0,0 +1,149 @@
+import os, mmap, struct, threading, time
+import codec
+from repositorio import Leilao
+
+_TAMANHO = struct.Struct(">I")
+
+class Diario:
+    """Write-ahead log + snapshots do estado dos leilões de um validador.
+
+    Cada mudança aceita (leilão recebido, lance aceito, encerramento) é
+    anexada ao .wal como o estado completo do leilão depois da mudança, então
+    o replay é só sobrescrever registros. Leilões descartados da memória
+    entram no .wal com status 'removido'.
+
+    Depois de `intervalo_snapshot` registros uma thread de fundo grava o
+    repositório inteiro no .snap, fora do caminho dos lances: sob o lock só
+    são copiados os campos dos leilões e o .wal vira .wal.old (os registros
+    seguintes vão para um .wal novo); a codificação, o fsync e o rename do
+    .snap são feitos sem o lock e só então o .wal.old é apagado. Se o processo
+    cair antes disso, restaurar() reaplica snap + .wal.old + .wal: como cada
+    registro é o estado completo, reaplicar o .wal.old sobre um .snap já
+    gravado termina no mesmo estado.
+
+    registrar() só escreve no buffer; quem chama deve chamar sincronizar()
+    antes de publicar ou dar ack no que foi registrado.
+    """
+
+    def __init__(self, pasta, nome, repositorio, intervalo_snapshot=10000, fsync=False):
+        os.makedirs(pasta, exist_ok=True)
+        self.caminho_wal = os.path.join(pasta, f"{nome}.wal")
+        self.caminho_snap = os.path.join(pasta, f"{nome}.snap")
+        self.caminho_wal_antigo = self.caminho_wal + ".old"
+        self.repositorio = repositorio
+        self.intervalo_snapshot = intervalo_snapshot
+        self.fsync = fsync
+        self.registros = 0
+        self.wal = None
+
+    def restaurar(self):
+        """Carrega o snapshot e reaplica o WAL no repositório. Retorna quantos leilões foram restaurados."""
+        if os.path.exists(self.caminho_snap) and os.path.getsize(self.caminho_snap) > 0:
+            with open(self.caminho_snap, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for dados in codec.decodificar_todos(mm):
+                        self._aplicar(dados)
+
+        # Snapshot interrompido: os registros anteriores a ele ainda estão no .wal.old
+        antigo = os.path.exists(self.caminho_wal_antigo)
+        if antigo:
+            self._reaplicar(self.caminho_wal_antigo)
+        valido = self._reaplicar(self.caminho_wal) if os.path.exists(self.caminho_wal) else 0
+
+        self.wal = open(self.caminho_wal, "ab")
+        self.wal.truncate(valido)
+        if antigo:
+            # Junta tudo num snapshot novo antes de voltar a registrar
+            self._gravar_snapshot(self._copiar_estados())
+            self.wal.seek(0)
+            self.wal.truncate(0)
+            self.registros = 0
+            os.remove(self.caminho_wal_antigo)
+        return len(self.repositorio)
+
+    def _reaplicar(self, caminho):
+        """Aplica os registros completos de um WAL e retorna até onde ele é válido."""
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        pos = 0
+        while pos + 4 <= len(conteudo):
+            tamanho = _TAMANHO.unpack_from(conteudo, pos)[0]
+            if pos + 4 + tamanho > len(conteudo):
+                break  # último registro incompleto (queda no meio da escrita)
+            self._aplicar(codec.decodificar(conteudo[pos + 4:pos + 4 + tamanho]))
+            pos += 4 + tamanho
+            self.registros += 1
+        return pos
+
+    def _aplicar(self, dados):
+        leilao = self.repositorio.buscar(dados['id'])
+        if dados['status'] == 'removido':
+            self.repositorio.remover(dados['id'])
+        elif leilao is None:
+            self.repositorio.adicionar(Leilao(dados['id'], dados['descricao'], status=dados['status'],
+                                              valor=dados['valor'], cliente=dados['cliente']))
+        else:
+            leilao.valor = dados['valor']
+            leilao.cliente = dados['cliente']
+            self.repositorio.atualizar_status(leilao, dados['status'])
+
+    def _estado(self, id, descricao, valor, cliente, status):
+        return codec.codificar("estado", {"id": id, "descricao": descricao, "valor": valor,
+                                          "cliente": cliente, "status": status})
+
+    def _anexar(self, registro):
+        self.wal.write(_TAMANHO.pack(len(registro)))
+        self.wal.write(registro)
+        self.registros += 1
+
+    def registrar(self, leilao):
+        """Anexa o estado atual do leilão ao WAL. Deve ser chamado com o lock do repositório."""
+        self._anexar(self._estado(leilao.id, leilao.descricao, leilao.valor, leilao.cliente, leilao.status))
+
+    def remover(self, leilao):
+        """Registra que o leilão saiu do repositório. Deve ser chamado com o lock do repositório."""
+        self._anexar(self._estado(leilao.id, leilao.descricao, None, None, "removido"))
+
+    def sincronizar(self):
+        # O lock impede que o snapshot feche e troque o .wal no meio do flush
+        with self.repositorio.lock:
+            self.wal.flush()
+            if self.fsync:
+                os.fsync(self.wal.fileno())
+
+    def _copiar_estados(self):
+        with self.repositorio.lock:
+            return [(l.id, l.descricao, l.valor, l.cliente, l.status) for l in self.repositorio.listar()]
+
+    def _gravar_snapshot(self, estados):
+        corpo = codec.codificar_lote([self._estado(*estado) for estado in estados])
+        temporario = self.caminho_snap + ".tmp"
+        with open(temporario, "wb") as f:
+            f.write(corpo)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho_snap)
+
+    def snapshot(self):
+        """Grava o estado inteiro e descarta o WAL anterior a ele. Só uma thread por vez."""
+        with self.repositorio.lock:
+            estados = self._copiar_estados()
+            self.wal.flush()
+            os.fsync(self.wal.fileno())
+            self.wal.close()
+            os.replace(self.caminho_wal, self.caminho_wal_antigo)
+            self.wal = open(self.caminho_wal, "ab")
+            self.registros = 0
+
+        self._gravar_snapshot(estados)
+        os.remove(self.caminho_wal_antigo)
+
+    def iniciar_snapshots(self, intervalo=1.0):
+        """Thread que grava um snapshot sempre que o WAL passa de intervalo_snapshot registros."""
+        def verificar():
+            while True:
+                time.sleep(intervalo)
+                if self.registros >= self.intervalo_snapshot:
+                    self.snapshot()
+
+        threading.Thread(target=verificar, daemon=True).start()
@@ -0,0 +1,69 @@
+import os, threading, time
+from collections import OrderedDict
+import assinatura
+
+class RegistroChaves:
+    """Cache LRU de verificadores já montados, um por (cliente, esquema).
+
+    A chave pública só é lida e parseada no primeiro uso (ou quando o arquivo
+    muda em disco), de modo que a validação de um lance custa apenas a
+    verificação da assinatura.
+    """
+
+    def __init__(self, pasta="chaves", capacidade=1024, intervalo_checagem=1.0):
+        self.pasta = pasta
+        self.capacidade = capacidade
+        # De quanto em quanto tempo (s) o mtime do arquivo é conferido por cliente
+        self.intervalo_checagem = intervalo_checagem
+        self.cache = OrderedDict()  # (cliente, esquema) -> [mtime, ultima_checagem, verificador]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def caminho(self, cliente, esquema="rsa"):
+        return assinatura.caminhos(cliente, esquema, self.pasta)[1]
+
+    def verificador(self, cliente, esquema="rsa"):
+        """Retorna o verificador do cliente; levanta FileNotFoundError se não houver chave."""
+        chave = (cliente, esquema)
+        agora = time.monotonic()
+        with self.lock:
+            entrada = self.cache.get(chave)
+            if entrada is not None and agora - entrada[1] < self.intervalo_checagem:
+                self.cache.move_to_end(chave)
+                self.hits += 1
+                return entrada[2]
+
+        mtime = os.stat(self.caminho(cliente, esquema)).st_mtime_ns
+
+        with self.lock:
+            entrada = self.cache.get(chave)
+            if entrada is not None and entrada[0] == mtime:
+                entrada[1] = agora
+                self.cache.move_to_end(chave)
+                self.hits += 1
+                return entrada[2]
+            self.misses += 1
+
+        with open(self.caminho(cliente, esquema), "rb") as f:
+            verificador = assinatura.Verificador(esquema, f.read())
+
+        with self.lock:
+            self.cache[chave] = [mtime, agora, verificador]
+            self.cache.move_to_end(chave)
+            while len(self.cache) > self.capacidade:
+                self.cache.popitem(last=False)
+        return verificador
+
+    def invalidar(self, cliente=None):
+        """Descarta as chaves de um cliente (rotação de chave) ou o cache inteiro."""
+        with self.lock:
+            if cliente is None:
+                self.cache.clear()
+            else:
+                for esquema in assinatura.ESQUEMAS:
+                    self.cache.pop((cliente, esquema), None)
+
+    def estatisticas(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "tamanho": len(self.cache)}
@@ -0,0 +1,70 @@
+import threading
+
+class Leilao:
+    __slots__ = ("id", "descricao", "inicio", "fim", "status", "valor", "cliente")
+
+    def __init__(self, id, descricao, inicio=None, fim=None, status="ativo", valor=None, cliente=None):
+        self.id = id
+        self.descricao = descricao
+        self.inicio = inicio
+        self.fim = fim
+        self.status = status
+        self.valor = valor
+        self.cliente = cliente
+
+    def para_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+class RepositorioLeiloes:
+    """Leilões indexados por id e por status.
+
+    A ordem de inserção é mantida (o cliente numera os leilões por posição).
+    Toda mudança de status deve passar por atualizar_status para manter o
+    índice secundário consistente.
+    """
+
+    def __init__(self):
+        self.por_id = {}
+        self.por_status = {}  # status -> {id: Leilao}
+        self.lock = threading.RLock()
+
+    def adicionar(self, leilao):
+        with self.lock:
+            antigo = self.por_id.get(leilao.id)
+            if antigo is not None:
+                self.por_status[antigo.status].pop(antigo.id, None)
+            self.por_id[leilao.id] = leilao
+            self.por_status.setdefault(leilao.status, {})[leilao.id] = leilao
+        return leilao
+
+    def buscar(self, id):
+        return self.por_id.get(id)
+
+    def remover(self, id):
+        with self.lock:
+            leilao = self.por_id.pop(id, None)
+            if leilao is not None:
+                self.por_status[leilao.status].pop(id, None)
+        return leilao
+
+    def atualizar_status(self, leilao, status):
+        with self.lock:
+            if leilao.status == status:
+                return
+            self.por_status.get(leilao.status, {}).pop(leilao.id, None)
+            leilao.status = status
+            self.por_status.setdefault(status, {})[leilao.id] = leilao
+
+    def com_status(self, status):
+        with self.lock:
+            return list(self.por_status.get(status, {}).values())
+
+    def listar(self):
+        with self.lock:
+            return list(self.por_id.values())
+
+    def __len__(self):
+        return len(self.por_id)
+
+    def __iter__(self):
+        return iter(self.listar())
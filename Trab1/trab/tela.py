@@ -0,0 +1,120 @@
+import sys, threading, time
+
+LIMPAR = "\x1b[H\x1b[2J"
+SALVAR_CURSOR = "\x1b7"
+RESTAURAR_CURSOR = "\x1b8"
+PRIMEIRA_LINHA = 4  # linha do terminal onde começa a tabela (depois do título e do cabeçalho)
+
+class Tela:
+    """Tabela de leilões do cliente, redesenhada por uma thread própria.
+
+    Os callbacks de mensagens só marcam o que mudou (marcar / marcar_tudo). A
+    thread junta as mudanças e redesenha no máximo `fps` vezes por segundo:
+    se só mudaram valores de leilões já visíveis, reescreve apenas essas linhas
+    (posicionando o cursor com ANSI); senão redesenha a página inteira.
+    """
+
+    def __init__(self, leiloes, fps=4, tamanho_pagina=20):
+        self.leiloes = leiloes
+        self.intervalo = 1 / fps
+        self.tamanho_pagina = tamanho_pagina
+        self.pagina = 0
+        self.filtro = ""
+        self.aviso = ""
+        self.sujos = set()
+        self.tudo_sujo = True
+        self.visiveis = {}  # id -> (linha na tela, número do leilão)
+        self.lock = threading.Lock()
+        self.mudou = threading.Event()
+        threading.Thread(target=self._executar, daemon=True).start()
+
+    def marcar(self, leilao_id):
+        with self.lock:
+            self.sujos.add(leilao_id)
+        self.mudou.set()
+
+    def marcar_tudo(self):
+        with self.lock:
+            self.tudo_sujo = True
+        self.mudou.set()
+
+    def avisar(self, texto):
+        self.aviso = texto
+        self.marcar_tudo()
+
+    def ir_para(self, pagina):
+        self.pagina = max(0, pagina)
+        self.marcar_tudo()
+
+    def filtrar(self, texto):
+        self.filtro = texto.lower()
+        self.pagina = 0
+        self.marcar_tudo()
+
+    def _executar(self):
+        while True:
+            self.mudou.wait()
+            self.mudou.clear()
+            with self.lock:
+                tudo, sujos = self.tudo_sujo, self.sujos
+                self.tudo_sujo, self.sujos = False, set()
+
+            if tudo:
+                self._desenhar_tudo()
+            else:
+                self._desenhar_linhas(sujos)
+            # Mudanças que chegarem agora esperam o próximo quadro
+            time.sleep(self.intervalo)
+
+    def _formatar(self, numero, leilao):
+        valor = f"R${leilao.valor:.2f}" if leilao.valor is not None else "-"
+        ultimo_lance = leilao.cliente if leilao.cliente is not None else "-"
+        return f"{numero:<5}{leilao.descricao[:29]:<30}{valor:<10}{ultimo_lance:<20}{leilao.status:<10}"
+
+    def _desenhar_tudo(self):
+        # Os números mostrados são a posição do leilão na lista completa, que é o
+        # que o comando de lance usa, independentemente de página e filtro.
+        encontrados = [(numero, leilao) for numero, leilao in enumerate(self.leiloes.listar())
+                       if self.filtro in leilao.descricao.lower()]
+        paginas = max(1, -(-len(encontrados) // self.tamanho_pagina))
+        self.pagina = min(self.pagina, paginas - 1)
+        inicio = self.pagina * self.tamanho_pagina
+        pagina = encontrados[inicio:inicio + self.tamanho_pagina]
+
+        saida = [LIMPAR, f"=== LEILÕES EM EXECUÇÃO === página {self.pagina + 1}/{paginas}"]
+        saida[-1] += f" | filtro: '{self.filtro}'" if self.filtro else ""
+        saida.append(f"{'Nº':<5}{'Descrição':<30}{'Valor':<10}{'Último Lance':<20}{'Status':<10}")
+        saida.append("-" * 80)
+
+        visiveis = {}
+        if not pagina:
+            saida.append("Nenhum leilão ativo no momento.")
+        for posicao, (numero, leilao) in enumerate(pagina):
+            visiveis[leilao.id] = (PRIMEIRA_LINHA + posicao, numero)
+            saida.append(self._formatar(numero, leilao))
+        self.visiveis = visiveis
+
+        saida.append("=" * 80)
+        saida.append("Digite: <numero_do_leilao> <valor_do_lance>")
+        saida.append("       'p <pagina>' para mudar de página, 'f <texto>' para filtrar, 'f' para limpar o filtro")
+        saida.append("Ou digite 'sair' para encerrar")
+        saida.append(self.aviso)
+        saida.append("> ")
+        sys.stdout.write(saida[0] + "\n".join(saida[1:]))
+        sys.stdout.flush()
+
+    def _desenhar_linhas(self, ids):
+        saida = [SALVAR_CURSOR]
+        for leilao_id in ids:
+            if leilao_id not in self.visiveis:
+                continue
+            leilao = self.leiloes.buscar(leilao_id)
+            if leilao is None:
+                continue
+            linha, numero = self.visiveis[leilao_id]
+            saida.append(f"\x1b[{linha};1H\x1b[2K{self._formatar(numero, leilao)}")
+        if len(saida) == 1:
+            return
+        saida.append(RESTAURAR_CURSOR)
+        sys.stdout.write("".join(saida))
+        sys.stdout.flush()
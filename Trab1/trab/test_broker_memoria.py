@@ -0,0 +1,19 @@
+import pytest
+from broker_memoria import casa_topico
+
+@pytest.mark.parametrize("padrao, chave, casa", [
+    ("leilao.7", "leilao.7", True),
+    ("leilao.7", "leilao.8", False),
+    ("leilao.*", "leilao.7", True),
+    ("leilao.*", "leilao", False),
+    ("leilao.*", "leilao.7.lance", False),
+    ("leilao.#", "leilao", True),
+    ("leilao.#", "leilao.7.lance", True),
+    ("#", "", True),
+    ("#", "leilao.7", True),
+    ("*.7", "leilao.7", True),
+    ("#.7", "a.b.7", True),
+    ("#.7", "a.b.8", False),
+])
+def test_casa_topico(padrao, chave, casa):
+    assert casa_topico(padrao.split("."), chave.split(".")) == casa
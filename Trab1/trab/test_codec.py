@@ -0,0 +1,40 @@
+from datetime import datetime
+import pytest
+import codec
+
+def test_ida_e_volta():
+    lance = {"id": 7, "valor": 12.5, "cliente": "ana", "assinatura": b"\x00\xff", "esquema": "ed25519", "nonce": 3}
+    assert codec.decodificar(codec.codificar("lance", lance)) == lance
+
+def test_campos_nulos_e_datas():
+    encerrar = {"id": 1, "descricao": "Relógio", "inicio": datetime(2024, 5, 1, 10, 0),
+                "fim": None, "status": "encerrado"}
+    assert codec.decodificar(codec.codificar("encerrar", encerrar)) == encerrar
+
+def test_lote():
+    mensagens = [codec.codificar("iniciar", {"id": i, "descricao": f"leilão {i}"}) for i in range(3)]
+    assert codec.decodificar_todos(codec.codificar_lote(mensagens)) == \
+        [{"id": i, "descricao": f"leilão {i}"} for i in range(3)]
+    assert codec.decodificar_todos(mensagens[0]) == [{"id": 0, "descricao": "leilão 0"}]
+
+def test_ler_id():
+    body = codec.codificar("lance_validado", {"id": 42, "valor": 1.0, "cliente": "ana", "status": "ativo"})
+    assert codec.ler_id(body) == 42
+    with pytest.raises(ValueError):
+        codec.ler_id(codec.codificar("rotacao", {"cliente": "ana"}))
+
+def test_campo_no_limite():
+    descricao = "x" * codec.TAMANHO_MAXIMO
+    assert codec.decodificar(codec.codificar("iniciar", {"id": 1, "descricao": descricao}))["descricao"] == descricao
+
+def test_campo_grande_demais():
+    with pytest.raises(ValueError, match="descricao"):
+        codec.codificar("iniciar", {"id": 1, "descricao": "é" * codec.TAMANHO_MAXIMO})
+    with pytest.raises(ValueError, match="assinatura"):
+        codec.codificar("lance", {"id": 1, "valor": 1.0, "cliente": "ana",
+                                  "assinatura": bytes(codec.TAMANHO_MAXIMO + 1), "esquema": "rsa", "nonce": 0})
+
+def test_atraso_fila():
+    assert codec.atraso_fila(None) is None
+    assert codec.atraso_fila(codec.PROPRIEDADES) is None
+    assert 0 <= codec.atraso_fila(codec.propriedades_com_horario()) < 1
@@ -0,0 +1,49 @@
+from consumo import Coalescedor
+
+class Conexao:
+    """Só guarda os timers; o teste decide quando eles vencem."""
+
+    def __init__(self):
+        self.timers = []
+
+    def call_later(self, atraso, callback):
+        self.timers.append(callback)
+
+    def vencer(self):
+        timers, self.timers = self.timers, []
+        for callback in timers:
+            callback()
+
+def coalescedor(janela):
+    publicados = []
+    conexao = Conexao()
+    return conexao, Coalescedor(conexao, lambda leilao_id, body: publicados.append((leilao_id, body)), janela), publicados
+
+def test_janela_zero_publica_na_hora():
+    conexao, c, publicados = coalescedor(0)
+    c.adicionar(1, b"a")
+    c.adicionar(1, b"b")
+    assert publicados == [(1, b"a"), (1, b"b")]
+    assert conexao.timers == []
+
+def test_publica_so_a_ultima_da_janela():
+    conexao, c, publicados = coalescedor(0.1)
+    c.adicionar(1, b"a")
+    c.adicionar(2, b"x")
+    c.adicionar(1, b"b")
+    assert publicados == []
+    assert len(conexao.timers) == 2
+    conexao.vencer()
+    assert publicados == [(1, b"b"), (2, b"x")]
+
+    # A janela seguinte começa com a próxima atualização
+    c.adicionar(1, b"c")
+    conexao.vencer()
+    assert publicados[-1] == (1, b"c")
+
+def test_descartar():
+    conexao, c, publicados = coalescedor(0.1)
+    c.adicionar(1, b"a")
+    c.descartar(1)
+    conexao.vencer()
+    assert publicados == []
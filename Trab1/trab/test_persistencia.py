@@ -0,0 +1,95 @@
+import os, threading, time
+from persistencia import Diario, _TAMANHO
+from repositorio import Leilao, RepositorioLeiloes
+
+def abrir(pasta):
+    repositorio = RepositorioLeiloes()
+    diario = Diario(str(pasta), "teste", repositorio)
+    diario.restaurar()
+    return repositorio, diario
+
+def registrar(repositorio, diario, leilao):
+    with repositorio.lock:
+        repositorio.adicionar(leilao)
+        diario.registrar(leilao)
+
+def estados(repositorio):
+    return {l.id: (l.descricao, l.valor, l.cliente, l.status) for l in repositorio.listar()}
+
+def test_restaura_snapshot_e_wal(tmp_path):
+    repositorio, diario = abrir(tmp_path)
+    registrar(repositorio, diario, Leilao(1, "a", valor=10.0, cliente="ana"))
+    registrar(repositorio, diario, Leilao(2, "b"))
+    diario.snapshot()
+    registrar(repositorio, diario, Leilao(1, "a", valor=20.0, cliente="bia"))
+    with repositorio.lock:
+        diario.remover(repositorio.remover(2))
+    diario.sincronizar()
+    diario.wal.close()
+
+    restaurado, _ = abrir(tmp_path)
+    assert estados(restaurado) == {1: ("a", 20.0, "bia", "ativo")}
+
+def test_snapshot_interrompido(tmp_path):
+    repositorio, diario = abrir(tmp_path)
+    registrar(repositorio, diario, Leilao(1, "a", valor=10.0, cliente="ana"))
+    # Queda entre trocar o .wal e gravar o .snap
+    diario.wal.close()
+    os.replace(diario.caminho_wal, diario.caminho_wal_antigo)
+    diario.wal = open(diario.caminho_wal, "ab")
+    registrar(repositorio, diario, Leilao(2, "b"))
+    diario.sincronizar()
+    diario.wal.close()
+
+    restaurado, novo = abrir(tmp_path)
+    assert estados(restaurado) == {1: ("a", 10.0, "ana", "ativo"), 2: ("b", None, None, "ativo")}
+    assert not os.path.exists(novo.caminho_wal_antigo)
+    novo.wal.close()
+    assert estados(abrir(tmp_path)[0]) == estados(restaurado)
+
+def test_registro_incompleto(tmp_path):
+    repositorio, diario = abrir(tmp_path)
+    registrar(repositorio, diario, Leilao(1, "a"))
+    # Queda no meio da escrita do segundo registro
+    diario.wal.write(_TAMANHO.pack(100) + b"\x01\x08")
+    diario.sincronizar()
+    diario.wal.close()
+
+    restaurado, novo = abrir(tmp_path)
+    assert estados(restaurado) == {1: ("a", None, None, "ativo")}
+    # O que vier depois entra no lugar do registro incompleto
+    registrar(restaurado, novo, Leilao(2, "b"))
+    novo.sincronizar()
+    novo.wal.close()
+    assert set(estados(abrir(tmp_path)[0])) == {1, 2}
+
+def test_sincronizar_durante_snapshots(tmp_path):
+    repositorio, diario = abrir(tmp_path)
+    for i in range(50):
+        registrar(repositorio, diario, Leilao(i, "a"))
+    erros = []
+    parar = threading.Event()
+
+    def snapshots():
+        try:
+            while not parar.is_set():
+                diario.snapshot()
+        except Exception as e:
+            erros.append(e)
+
+    thread = threading.Thread(target=snapshots)
+    thread.start()
+    try:
+        # Como o lance.py: sincronizar() fora do lock, enquanto o snapshot troca o .wal
+        fim = time.monotonic() + 1
+        while time.monotonic() < fim:
+            diario.sincronizar()
+    except Exception as e:
+        erros.append(e)
+    finally:
+        parar.set()
+        thread.join()
+    assert erros == []
+
+    diario.wal.close()
+    assert estados(abrir(tmp_path)[0]) == estados(repositorio)
@@ -0,0 +1,9 @@
+"""Escolhe o backend de mensageria dos serviços (LEILAO_TRANSPORTE)."""
+import pika
+import config
+
+def conectar():
+    if config.transporte() == "memoria":
+        import broker_memoria
+        return broker_memoria.conectar()
+    return pika.BlockingConnection(pika.ConnectionParameters(host=config.host()))
@@ -3,10 +3,14 @@
 # Gustavo Esmanhoto Bareta
 
 import Pyro5.api
+import Pyro5.errors
 import threading
 import time
 import sys
 import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from proxy_pool import ProxyPool
+from failure_detector import FailureDetector
 
 @Pyro5.api.expose
 class AgrawalaProcess:
@@ -17,106 +21,186 @@ class AgrawalaProcess:
         self.replies = 0
         self.deferred = []
         self.lock = threading.Lock()
+        # request_resource espera as respostas aqui
+        self.replies_cond = threading.Condition(self.lock)
+        # Tempo (s) entre pedir o recurso e entrar na seção crítica, por pedido
+        self.acquire_latencies = []
 
         # Configurações
         self.resource_access_time = 5
         self.heartbeat_interval = 2
         self.heartbeat_timeout = 6  # Aumentado para maior tolerância em redes lentas
         self.request_timeout = 10
+        self.peer_timeout = 2  # tempo máximo para entregar o pedido a um peer
+        self.proxy_idle_timeout = 30
+        # A lista de peers é mantida por anúncios de join/leave; o nameserver só
+        # é consultado por inteiro na inicialização e a cada resync
+        self.membership_resync_interval = 60
+        self.last_resync = 0
+        self.uri = None
 
         # Estado compartilhado: Armazena URIs em vez de proxies para segurança de thread.
         self.active_peers_uris = {}
-        self.last_heartbeat = {}
-
-    def get_proxy(self, peer_name):
-        """Cria um proxy para um peer de forma segura, usando sua URI."""
+        # Conexões abertas com os peers, reaproveitadas entre as chamadas
+        self.proxies = ProxyPool(idle_timeout=self.proxy_idle_timeout, call_timeout=self.request_timeout)
+        # Envia os pedidos a todos os peers ao mesmo tempo
+        self.fanout = ThreadPoolExecutor(max_workers=32)
+        # Latências do último pedido, por peer: envio do pedido e chegada da resposta (s)
+        self.send_latencies = {}
+        self.reply_latencies = {}
+        # Detecção de falhas por gossip: cada rodada sonda só alguns peers, e um
+        # peer que não responde às sondagens por heartbeat_timeout é removido
+        self.detector = FailureDetector(self.pid, None, self.call_peer,
+                                        heartbeat_timeout=self.heartbeat_timeout,
+                                        interval=self.heartbeat_interval,
+                                        ping_timeout=self.peer_timeout / 2,
+                                        on_discover=self.discover)
+
+    def peer_uri(self, peer_name):
+        """URI de um peer; se ainda não for conhecido (pediu o recurso antes do
+        próximo update_peers), é buscado uma vez no nameserver."""
         with self.lock:
             uri = self.active_peers_uris.get(peer_name)
-        if uri:
+        if uri is None:
             try:
-                # Cria um novo proxy. Essencial para segurança entre threads.
-                return Pyro5.api.Proxy(uri)
+                with Pyro5.api.locate_ns() as ns:
+                    uri = ns.lookup(peer_name)
             except Exception as e:
-                print(f"[{self.pid}] Erro ao criar proxy para {peer_name}: {e}")
-        return None
+                print(f"[{self.pid}] Peer {peer_name} não encontrado no nameserver: {e}")
+                return None
+            with self.lock:
+                self.active_peers_uris.setdefault(peer_name, uri)
+            self.detector.track(peer_name, uri)
+        return uri
+
+    def call_peer(self, peer_name, method, *args, timeout=None):
+        """Chama um método remoto do peer por uma conexão do pool. Levanta a exceção do Pyro em caso de falha."""
+        uri = self.peer_uri(peer_name)
+        if uri is None:
+            raise Pyro5.errors.NamingError(f"peer {peer_name} desconhecido")
+        return self.proxies.call(uri, method, *args, timeout=timeout)
 
     def update_peers(self):
-        """Atualiza a lista de URIs de peers a partir do nameserver."""
+        """Resync completo: substitui a lista de URIs de peers pelo que está no nameserver."""
+        self.last_resync = time.time()
         try:
             with Pyro5.api.locate_ns() as ns:
-                # Filtra por nomes no formato 'ricart.PeerX', excluindo a si mesmo.
-                peer_uris = {name: uri for name, uri in ns.list().items()
-                             if re.match(r'^ricart\.Peer[A-Za-z0-9]+$', name) and name != self.pid}
+                # Só os nomes 'ricart.*' vêm do nameserver; o formato 'ricart.PeerX' é conferido aqui
+                peer_uris = {name: uri for name, uri in ns.list(prefix="ricart.").items()
+                             if self.is_peer_name(name)}
 
             with self.lock:
+                removed_uris = [uri for name, uri in self.active_peers_uris.items() if peer_uris.get(name) != uri]
                 self.active_peers_uris = peer_uris
-                # Remove heartbeats de peers que não estão mais registrados
-                stale_heartbeats = [p_name for p_name in self.last_heartbeat if p_name not in self.active_peers_uris]
-                for p_name in stale_heartbeats:
-                    del self.last_heartbeat[p_name]
-                # Adiciona novos peers ao rastreamento de heartbeat
-                for p_name in self.active_peers_uris:
-                    if p_name not in self.last_heartbeat:
-                        self.last_heartbeat[p_name] = time.time()
+                # Deixa de acompanhar peers que não estão mais registrados
+                for p_name in self.detector.members():
+                    if p_name not in self.active_peers_uris:
+                        self.detector.forget(p_name)
+                # Passa a acompanhar os novos
+                for p_name, uri in self.active_peers_uris.items():
+                    if not self.detector.is_tracked(p_name):
+                        self.detector.track(p_name, uri)
+
+            for uri in removed_uris:
+                self.proxies.discard(uri)
 
         except Exception as e:
             # Evita que o programa pare se o nameserver estiver temporariamente indisponível
             print(f"[{self.pid}] Falha ao conectar com o Name Server durante a atualização de peers: {e}")
 
+    def is_peer_name(self, name):
+        return re.match(r'^ricart\.Peer[A-Za-z0-9]+$', name) is not None and name != self.pid
+
+    def announce(self, method, *args):
+        """Envia join/leave a todos os peers conhecidos, em paralelo. Retorna os futures."""
+        with self.lock:
+            peers = list(self.active_peers_uris.keys())
+        return [self.fanout.submit(self.call_peer, peer_name, method, *args, timeout=self.peer_timeout)
+                for peer_name in peers]
+
+    @Pyro5.api.oneway
+    def join(self, pid, uri):
+        """Um peer entrou (ou reiniciou com outra URI)."""
+        if not self.is_peer_name(pid):
+            return
+        with self.lock:
+            old_uri = self.active_peers_uris.get(pid)
+            self.active_peers_uris[pid] = uri
+        self.detector.track(pid, uri)
+        if old_uri is not None and old_uri != uri:
+            self.proxies.discard(old_uri)
+        if old_uri != uri:
+            print(f"[{self.pid}] Peer {pid} entrou.")
+
+    @Pyro5.api.oneway
+    def leave(self, pid, uri):
+        """Um peer saiu. A URI evita que o leave de uma execução antiga remova a atual."""
+        with self.lock:
+            if self.active_peers_uris.get(pid) != uri:
+                return
+            del self.active_peers_uris[pid]
+        self.detector.forget(pid)
+        self.proxies.discard(uri)
+        print(f"[{self.pid}] Peer {pid} saiu.")
+
     def periodic_updater(self):
         """Thread única que executa tarefas de manutenção periodicamente."""
         while True:
-            self.update_peers()
+            if time.time() - self.last_resync >= self.membership_resync_interval:
+                self.update_peers()
             self.check_heartbeats()
-            self.send_heartbeat()
+            self.proxies.evict_idle()
             time.sleep(self.heartbeat_interval)
 
-    def send_heartbeat(self):
-        """Envia um sinal de 'vida' (heartbeat) para todos os peers ativos."""
+    def discover(self, pid, uri):
+        """Peer novo conhecido por um ping ou pelo digest de outro peer."""
+        if not self.is_peer_name(pid) or uri is None:
+            return False
         with self.lock:
-            peers_to_send = list(self.active_peers_uris.keys())
+            new = pid not in self.active_peers_uris
+            self.active_peers_uris.setdefault(pid, uri)
+        if new:
+            print(f"[{self.pid}] Peer {pid} descoberto por gossip.")
+        return True
 
-        for peer_name in peers_to_send:
-            proxy = self.get_proxy(peer_name)
-            if proxy:
-                try:
-                    proxy.receive_heartbeat(self.pid)
-                except Exception:
-                    # A falha será detectada pelo timeout no 'check_heartbeats'
-                    pass
+    def ping(self, sender_pid, sender_uri, digest):
+        """Sonda direta do detector de falhas; responde com o digest deste processo."""
+        return self.detector.handle_ping(sender_pid, sender_uri, digest)
+
+    def ping_req(self, target_pid):
+        """Sonda indireta: um peer que não alcançou `target_pid` pede que tentemos daqui."""
+        return self.detector.handle_ping_req(target_pid)
 
     @Pyro5.api.oneway
     def receive_heartbeat(self, sender_pid):
-        """Registra a recepção de um heartbeat de outro processo."""
+        """Heartbeat de um peer antigo (antes do gossip); vale como notícia de que está vivo."""
         with self.lock:
-            if sender_pid in self.active_peers_uris:
-                self.last_heartbeat[sender_pid] = time.time()
+            known = sender_pid in self.active_peers_uris
+        if known:
+            self.detector.track(sender_pid)
 
     def check_heartbeats(self):
-        """Verifica se algum peer ficou inativo (não enviou heartbeat a tempo)."""
-        with self.lock:
-            peers_to_check = list(self.last_heartbeat.items())
-            now = time.time()
-            removed_peers = []
-            for peer_name, last_seen in peers_to_check:
-                if now - last_seen > self.heartbeat_timeout:
-                    removed_peers.append(peer_name)
-            
-            if removed_peers:
-                print(f"[{self.pid}] Peers inativos por timeout de heartbeat: {removed_peers}. Removendo.")
-                for peer_name in removed_peers:
-                    if peer_name in self.active_peers_uris:
-                        del self.active_peers_uris[peer_name]
-                    if peer_name in self.last_heartbeat:
-                        del self.last_heartbeat[peer_name]
+        """Remove os peers que não respondem às sondagens do detector há mais de heartbeat_timeout."""
+        removed_peers = self.detector.expired()
+        if removed_peers:
+            print(f"[{self.pid}] Peers inativos por timeout de heartbeat: {removed_peers}. Removendo.")
+            with self.lock:
+                removed_uris = [self.active_peers_uris.pop(peer_name) for peer_name in removed_peers
+                                if peer_name in self.active_peers_uris]
                 print(f"[{self.pid}] Peers ativos após remoção: {list(self.active_peers_uris.keys())}")
+            for uri in removed_uris:
+                self.proxies.discard(uri)
 
     def request_resource(self):
         """Inicia o processo de solicitação para acessar o recurso crítico."""
+        # Peers já dados como mortos saem antes da contagem de respostas esperadas
+        self.check_heartbeats()
         with self.lock:
             self.state = "WANTED"
             self.timestamp = time.time()
             self.replies = 0
+            self.send_latencies = {}
+            self.reply_latencies = {}
             peers_to_request = list(self.active_peers_uris.keys())
 
         print(f"[{self.pid}] Pedindo recurso para {len(peers_to_request)} peers...")
@@ -125,39 +209,55 @@ class AgrawalaProcess:
             self.acquire_and_use_resource()
             return
 
-        expected_replies = len(peers_to_request)
-        for peer_name in peers_to_request:
-            proxy = self.get_proxy(peer_name)
-            if proxy:
-                try:
-                    proxy.request(self.timestamp, self.pid)
-                except Exception as e:
-                    print(f"[{self.pid}] Falha ao enviar requisição para {peer_name}: {e}")
-                    with self.lock:
-                        expected_replies -= 1
-            else:
-                 with self.lock:
-                    expected_replies -= 1
+        # Um pedido por peer, todos em paralelo: o envio custa o maior RTT, não a
+        # soma deles, e um peer lento só atrasa a si mesmo (até peer_timeout)
+        futures = {peer_name: self.fanout.submit(self.send_request, peer_name) for peer_name in peers_to_request}
+        wait(futures.values())
+        expected_replies = 0
+        for peer_name, future in futures.items():
+            try:
+                future.result()
+                expected_replies += 1
+            except Exception as e:
+                print(f"[{self.pid}] Falha ao enviar requisição para {peer_name}: {e}")
 
         # Aguarda por respostas ou até o timeout
-        start_wait_time = time.time()
-        while time.time() - start_wait_time < self.request_timeout:
-            with self.lock:
-                if self.replies >= expected_replies:
-                    break
-            time.sleep(0.1)
-
-        with self.lock:
+        with self.replies_cond:
+            self.replies_cond.wait_for(lambda: self.replies >= expected_replies, timeout=self.request_timeout)
             if self.replies < expected_replies:
                 print(f"[{self.pid}] Timeout! Recebeu {self.replies}/{expected_replies} respostas. Assumindo posse do recurso.")
+            self.report_latencies()
 
         self.acquire_and_use_resource()
 
+    def send_request(self, peer_name):
+        """Envia o pedido a um peer e guarda quanto tempo o envio levou."""
+        inicio = time.time()
+        if self.detector.is_suspect(peer_name):
+            # O request é oneway: por uma conexão antiga do pool ele "sai" mesmo
+            # com o peer morto. Numa conexão nova, a falha aparece no envio.
+            with self.lock:
+                uri = self.active_peers_uris.get(peer_name)
+            if uri is not None:
+                self.proxies.discard(uri)
+        self.call_peer(peer_name, "request", self.timestamp, self.pid, timeout=self.peer_timeout)
+        with self.lock:
+            self.send_latencies[peer_name] = time.time() - inicio
+
+    def report_latencies(self):
+        """Imprime, por peer, o tempo de envio do pedido e o tempo até a resposta (chamar com o lock)."""
+        for peer_name, envio in sorted(self.send_latencies.items()):
+            resposta = self.reply_latencies.get(peer_name)
+            resposta = f"{resposta * 1000:.1f} ms" if resposta is not None else "sem resposta"
+            print(f"[{self.pid}]   {peer_name}: envio {envio * 1000:.1f} ms, resposta {resposta}")
+
     def acquire_and_use_resource(self):
         """Método interno para entrar na seção crítica."""
         with self.lock:
             self.state = "HELD"
-        print(f"[{self.pid}] Recurso adquirido! Acessando por {self.resource_access_time} segundos...")
+            latency = time.time() - self.timestamp
+            self.acquire_latencies.append(latency)
+        print(f"[{self.pid}] Recurso adquirido em {latency * 1000:.1f} ms! Acessando por {self.resource_access_time} segundos...")
         time.sleep(self.resource_access_time)
         self.release_resource()
 
@@ -170,12 +270,10 @@ class AgrawalaProcess:
 
         print(f"[{self.pid}] Recurso liberado. Respondendo a {len(deferred_copy)} pedidos adiados.")
         for (ts, pid) in deferred_copy:
-            proxy = self.get_proxy(pid)
-            if proxy:
-                try:
-                    proxy.reply(self.pid)
-                except Exception as e:
-                    print(f"[{self.pid}] Falha ao responder a {pid} (adiado): {e}")
+            try:
+                self.call_peer(pid, "reply", self.pid)
+            except Exception as e:
+                print(f"[{self.pid}] Falha ao responder a {pid} (adiado): {e}")
 
     @Pyro5.api.oneway
     def request(self, ts, pid):
@@ -189,10 +287,9 @@ class AgrawalaProcess:
                 print(f"[{self.pid}] Pedido de {pid} adiado.")
                 return
 
-        # Responde imediatamente se não precisar adiar
+        # Responde imediatamente se não precisar adiar, pela URI já conhecida (sem PYRONAME)
         try:
-            with Pyro5.api.Proxy(f"PYRONAME:{pid}") as peer_proxy:
-                peer_proxy.reply(self.pid)
+            self.call_peer(pid, "reply", self.pid)
         except Exception as e:
             print(f"[{self.pid}] Falha ao responder a {pid} (imediato): {e}")
 
@@ -201,6 +298,9 @@ class AgrawalaProcess:
         """Recebe uma resposta (permissão) de outro processo."""
         with self.lock:
             self.replies += 1
+            if self.state == "WANTED":
+                self.reply_latencies[pid] = time.time() - self.timestamp
+            self.replies_cond.notify_all()
             # A contagem de `expected_replies` é local ao método `request_resource`
             print(f"[{self.pid}] Resposta recebida de {pid} ({self.replies} recebidas).")
 
@@ -220,6 +320,8 @@ def main():
     try:
         daemon = Pyro5.api.Daemon()
         uri = daemon.register(process)
+        process.uri = str(uri)
+        process.detector.info = process.uri
         with Pyro5.api.locate_ns() as ns:
             ns.register(pid, uri)
         print(f"[{pid}] registrado no nameserver com sucesso.")
@@ -231,10 +333,19 @@ def main():
     updater_thread = threading.Thread(target=process.periodic_updater, daemon=True)
     updater_thread.start()
 
+    # Rodadas do detector de falhas numa thread própria: uma rodada com peers
+    # mortos espera pelos timeouts das sondagens e não pode atrasar a manutenção
+    detector_thread = threading.Thread(target=process.detector.run, daemon=True)
+    detector_thread.start()
+
     # Inicia thread para o loop de requisições do Pyro
     daemon_thread = threading.Thread(target=daemon.requestLoop, daemon=True)
     daemon_thread.start()
 
+    # Lista inicial de peers e aviso de entrada para eles
+    process.update_peers()
+    process.announce("join", pid, process.uri)
+
     # Loop de interação com o usuário
     print(f"--- Processo {pid} iniciado. ---")
     while True:
@@ -262,6 +373,15 @@ def main():
             print(f"\n[{pid}] Encerrando por interrupção.")
             break
 
+    # Avisa a saída e sai do nameserver, para os outros não esperarem o timeout de heartbeat
+    wait(process.announce("leave", pid, process.uri), timeout=process.peer_timeout)
+    try:
+        with Pyro5.api.locate_ns() as ns:
+            ns.remove(pid)
+    except Exception as e:
+        print(f"[{pid}] Falha ao sair do nameserver: {e}")
+    process.proxies.close()
+
 if __name__ == "__main__":
     main()
 
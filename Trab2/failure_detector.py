@@ -0,0 +1,193 @@
+"""Detector de falhas por gossip, no estilo do SWIM."""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class FailureDetector:
+    def __init__(self, self_id, info, call, heartbeat_timeout, interval,
+                 fanout=3, indirect=2, ping_timeout=1.0, digest_size=8, on_discover=None):
+        self.self_id = self_id
+        self.info = info  # dado extra do processo enviado no digest (URI, nome...)
+        self.call = call  # call(peer, method, *args, timeout=...)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.interval = interval
+        self.fanout = fanout
+        self.indirect = indirect
+        self.ping_timeout = ping_timeout
+        self.digest_size = digest_size
+        self.on_discover = on_discover
+
+        self.heartbeat = 0  # contador deste processo
+        self.counters = {}  # peer -> maior contador de heartbeat conhecido (os membros)
+        self.infos = {}  # peer -> info
+        self.suspects = {}  # peer -> instante da primeira sondagem sem resposta
+        self.dead = {}  # peer -> contador quando foi dado como morto
+        self.order = []  # próximos alvos da volta atual pela lista de membros
+        self.lock = threading.Lock()
+        # Alvos sondados em paralelo, e as sondas indiretas de cada um também:
+        # uma rodada custa uma sonda direta mais uma indireta, não a soma delas
+        self.executor = ThreadPoolExecutor(max_workers=fanout * (indirect + 1))
+
+    # --- Lista de membros ---
+
+    def track(self, peer, info=None, counter=0):
+        """Passa a acompanhar um peer, considerando-o vivo agora."""
+        with self.lock:
+            # Já entra no digest, mesmo sem contador conhecido
+            self.counters[peer] = max(counter, self.counters.get(peer, 0))
+            if info is not None:
+                self.infos[peer] = info
+            self.suspects.pop(peer, None)
+            self.dead.pop(peer, None)
+
+    def _alive(self, peer):
+        # Chamar com o lock
+        self.suspects.pop(peer, None)
+
+    def forget(self, peer):
+        with self.lock:
+            self.counters.pop(peer, None)
+            self.infos.pop(peer, None)
+            self.suspects.pop(peer, None)
+
+    def members(self):
+        with self.lock:
+            return list(self.counters)
+
+    def is_tracked(self, peer):
+        with self.lock:
+            return peer in self.counters
+
+    def is_suspect(self, peer):
+        with self.lock:
+            return peer in self.suspects
+
+    def expired(self):
+        """Suspeitos sem resposta há mais de heartbeat_timeout; são esquecidos e marcados como mortos."""
+        now = time.time()
+        with self.lock:
+            mortos = [peer for peer, since in self.suspects.items() if now - since > self.heartbeat_timeout]
+            for peer in mortos:
+                del self.suspects[peer]
+                self.infos.pop(peer, None)
+                self.dead[peer] = self.counters.pop(peer, -1)
+        return mortos
+
+    # --- Digest ---
+
+    def digest(self):
+        """{peer: (contador, info)} de alguns peers, sempre incluindo este processo."""
+        with self.lock:
+            peers = list(self.counters)
+            escolhidos = random.sample(peers, min(self.digest_size, len(peers)))
+            resumo = {peer: (self.counters[peer], self.infos.get(peer)) for peer in escolhidos}
+            resumo[self.self_id] = (self.heartbeat, self.info)
+        return resumo
+
+    def merge(self, digest):
+        descobertos = []
+        with self.lock:
+            for peer, (counter, info) in digest.items():
+                if peer == self.self_id:
+                    continue
+                if peer in self.counters:
+                    if counter > self.counters[peer]:
+                        self.counters[peer] = counter
+                        self._alive(peer)
+                # Um contador que não passou do de quando o peer morreu aqui é notícia velha
+                elif counter > self.dead.get(peer, -1):
+                    descobertos.append((peer, info, counter))
+        for peer, info, counter in descobertos:
+            if self.on_discover is not None and self.on_discover(peer, info):
+                self.track(peer, info, counter)
+
+    # --- Lado remoto ---
+
+    def handle_ping(self, sender, info, digest):
+        with self.lock:
+            conhecido = sender in self.counters
+        if sender != self.self_id and (conhecido or self.on_discover is None or self.on_discover(sender, info)):
+            self.track(sender, info)
+        self.merge(digest)
+        return self.digest()
+
+    def handle_ping_req(self, target):
+        """Sonda `target` em nome de outro processo.
+
+        Só sonda quem este processo acompanha: um peer já dado como morto aqui
+        não é ressuscitado por uma sondagem pedida por outro.
+        """
+        if not self.is_tracked(target):
+            return False
+        return self.probe(target)
+
+    # --- Sondagem ---
+
+    def probe(self, peer):
+        try:
+            digest = self.call(peer, "ping", self.self_id, self.info, self.digest(), timeout=self.ping_timeout)
+        except Exception:
+            return False
+        self.merge(digest)
+        with self.lock:
+            self._alive(peer)
+        return True
+
+    def ask_probe(self, helper, peer):
+        try:
+            return self.call(helper, "ping_req", peer, timeout=self.ping_timeout * 2)
+        except Exception:
+            return False
+
+    def probe_indirect(self, peer):
+        """Pede a `indirect` peers, ao mesmo tempo, que sondem `peer`; basta um conseguir."""
+        with self.lock:
+            helpers = [p for p in self.counters if p != peer and p not in self.suspects]
+        helpers = random.sample(helpers, min(self.indirect, len(helpers)))
+        futures = [self.executor.submit(self.ask_probe, helper, peer) for helper in helpers]
+        for future in as_completed(futures):
+            if future.result():
+                with self.lock:
+                    self._alive(peer)
+                return True
+        return False
+
+    def check(self, peer):
+        if self.probe(peer) or self.probe_indirect(peer):
+            return
+        with self.lock:
+            novo = peer in self.counters and peer not in self.suspects
+            if novo:
+                self.suspects[peer] = time.time()
+        if novo:
+            print(f"[{self.self_id}] Peer {peer} suspeito (sem resposta direta nem indireta).")
+
+    def targets(self):
+        """Os suspeitos e, no que sobrar do fanout, os próximos da volta pela lista de membros (chamar com o lock)."""
+        alvos = list(self.suspects)[:self.fanout]
+        while len(alvos) < self.fanout:
+            if not self.order:
+                self.order = [peer for peer in self.counters if peer not in alvos]
+                random.shuffle(self.order)
+                if not self.order:
+                    break
+            peer = self.order.pop()
+            if peer in self.counters and peer not in alvos:
+                alvos.append(peer)
+        return alvos
+
+    def round(self):
+        """Uma rodada: incrementa o contador e sonda `fanout` peers em paralelo (os suspeitos primeiro)."""
+        with self.lock:
+            self.heartbeat += 1
+            alvos = self.targets()
+        list(self.executor.map(self.check, alvos))
+
+    def run(self):
+        while True:
+            inicio = time.time()
+            self.round()
+            time.sleep(max(0, self.interval - (time.time() - inicio)))
@@ -0,0 +1,94 @@
+"""Pool de proxies Pyro5 por URI do peer, para reaproveitar as conexões."""
+
+import threading
+import time
+
+import Pyro5.api
+import Pyro5.errors
+
+
+class ProxyPool:
+    def __init__(self, idle_timeout=30, max_per_peer=4, call_timeout=None):
+        self.idle_timeout = idle_timeout
+        self.max_per_peer = max_per_peer  # conexões ociosas guardadas por peer
+        self.call_timeout = call_timeout
+        self.idle = {}  # uri -> [(proxy, última utilização)]
+        self.lock = threading.Lock()
+
+    def _checkout(self, uri):
+        """Retorna (proxy, veio do pool)."""
+        with self.lock:
+            proxies = self.idle.get(uri)
+            proxy = proxies.pop()[0] if proxies else None
+        if proxy is None:
+            proxy = Pyro5.api.Proxy(uri)
+            proxy._pyroTimeout = self.call_timeout
+            return proxy, False
+        proxy._pyroClaimOwnership()
+        return proxy, True
+
+    def _checkin(self, uri, proxy):
+        with self.lock:
+            proxies = self.idle.setdefault(uri, [])
+            if len(proxies) < self.max_per_peer:
+                proxies.append((proxy, time.time()))
+                proxy = None
+        if proxy is not None:
+            self._close(proxy)
+
+    def _close(self, proxy):
+        try:
+            proxy._pyroClaimOwnership()
+            proxy._pyroRelease()
+        except Exception:
+            pass
+
+    def call(self, uri, method, *args, timeout=None):
+        """Chama `method(*args)` no peer; se a conexão guardada tiver caído, refaz com outra."""
+        while True:
+            proxy, reused = self._checkout(uri)
+            if timeout is not None:
+                proxy._pyroTimeout = timeout
+            try:
+                result = getattr(proxy, method)(*args)
+            except Pyro5.errors.CommunicationError as e:
+                self._close(proxy)
+                # Timeout não é conexão velha: refazer só dobraria a espera
+                if reused and not isinstance(e, Pyro5.errors.TimeoutError):
+                    continue
+                raise
+            except BaseException:
+                proxy._pyroTimeout = self.call_timeout
+                self._checkin(uri, proxy)
+                raise
+            proxy._pyroTimeout = self.call_timeout
+            self._checkin(uri, proxy)
+            return result
+
+    def discard(self, uri):
+        """Fecha as conexões guardadas para um peer (saiu ou foi dado como morto)."""
+        with self.lock:
+            proxies = self.idle.pop(uri, [])
+        for proxy, _ in proxies:
+            self._close(proxy)
+
+    def evict_idle(self):
+        """Fecha as conexões sem uso há mais de `idle_timeout` segundos."""
+        limite = time.time() - self.idle_timeout
+        expirados = []
+        with self.lock:
+            for uri, proxies in list(self.idle.items()):
+                expirados.extend(proxy for proxy, usado in proxies if usado < limite)
+                proxies[:] = [(proxy, usado) for proxy, usado in proxies if usado >= limite]
+                if not proxies:
+                    del self.idle[uri]
+        for proxy in expirados:
+            self._close(proxy)
+        return len(expirados)
+
+    def close(self):
+        with self.lock:
+            todos = [proxy for proxies in self.idle.values() for proxy, _ in proxies]
+            self.idle.clear()
+        for proxy in todos:
+            self._close(proxy)
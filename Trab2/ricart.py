@@ -14,13 +14,18 @@ class RicartAgrawalaProcess:
         self.peersNames = []
         self.deferred = []
         self.lock = threading.Lock()
+        # Acordada por reply(); request_resource espera nela em vez de fazer polling
+        self.replies_cond = threading.Condition(self.lock)
+        self.acquire_latencies = []  # segundos entre pedir e obter o recurso
 
     def update_peers(self):
         """Atualiza a lista de peers a partir do nameserver, ignorando o nameserver"""
         with Pyro5.api.locate_ns() as ns:
             self.peers = []
-            for name, uri in ns.list().items():
-                if name.startswith("ricart.") and name != self.pid:  # só processos válidos
+            self.peersNames = []
+            # O filtro por prefixo é feito no próprio nameserver
+            for name, uri in ns.list(prefix="ricart.").items():
+                if name != self.pid:
                     self.peers.append(uri)
                     self.peersNames.append(name)
         print(f"[{self.pid}] Peers atualizados: {self.peersNames}")
@@ -40,11 +45,13 @@ class RicartAgrawalaProcess:
                 print(f"[{self.pid}] Peer {uri} não disponível, ignorando ({e})")
 
         # espera todos os replies válidos
-        while self.replies < len(self.peers):
-            time.sleep(0.1)
+        with self.replies_cond:
+            self.replies_cond.wait_for(lambda: self.replies >= len(self.peers))
 
         self.state = "HELD"
-        print(f"[{self.pid}] Recurso adquirido.")
+        latency = time.time() - self.timestamp
+        self.acquire_latencies.append(latency)
+        print(f"[{self.pid}] Recurso adquirido em {latency * 1000:.1f} ms.")
 
     def release_resource(self):
         """Libera o recurso e responde pedidos adiados"""
@@ -81,6 +88,7 @@ class RicartAgrawalaProcess:
         with self.lock:
             self.replies += 1
             print(f"[{self.pid}] Resposta recebida de {pid} ({self.replies}/{len(self.peers)}).")
+            self.replies_cond.notify_all()
 
 # --------------------- Interface do terminal ---------------------
 
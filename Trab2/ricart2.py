@@ -3,6 +3,8 @@ import threading
 import sys
 import time
 import queue
+from proxy_pool import ProxyPool
+from failure_detector import FailureDetector
 
 HEARTBEAT_TIMEOUT = 15
 HEARTBEAT_INTERVAL = 3
@@ -15,40 +17,57 @@ class RicartAgrawala:
         self.state = "RELEASED"
         self.peers = []
         self.peersNames = []
-        self.peersHeartbeat = {}
+        self.uri = None
         self.deferred = []
         self.lock = threading.Lock()
-
-    @Pyro5.api.expose
-    def receberHeartBeat(self, uri, name):
-        agora = time.time()
-        self.peersHeartbeat[uri] = agora
-
+        # Acordada por reply() e quando um peer morto sai da lista. Não usa
+        # self.lock: request() segura o lock enquanto chama o reply() do outro peer
+        self.replies_cond = threading.Condition()
+        self.replies = 0
+        self.acquire_latencies = []  # mostradas em mostrar_status
+        self.proxies = ProxyPool(call_timeout=REQUEST_TIMEOUT)
+        # Detector de falhas por gossip, com os peers identificados pela URI. O
+        # próprio id e nome são preenchidos quando o daemon registra o processo
+        self.detector = FailureDetector(None, None, self.proxies.call,
+                                        heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                                        interval=HEARTBEAT_INTERVAL,
+                                        on_discover=self.adicionar_peer)
+
+    def adicionar_peer(self, uri, name):
         # Adiciona o peer à lista se ainda não estiver nela
-        if uri != str(self.uri) and uri not in self.peers:
+        if uri == self.uri or name is None:
+            return False
+        if uri not in self.peers:
             self.peers.append(uri)
             self.peersNames.append(name)
             print(f"[{self.pid}] Novo peer adicionado: {name}")
+        return True
 
-        #print(f"[{self.pid}] Heartbeat recebido de {name} em {agora}")
+    @Pyro5.api.expose
+    def receberHeartBeat(self, uri, name):
+        # Heartbeat de um peer da versão antiga, sem gossip
+        if self.adicionar_peer(uri, name):
+            self.detector.track(uri, name)
+
+    @Pyro5.api.expose
+    def ping(self, uri, name, digest):
+        return self.detector.handle_ping(uri, name, digest)
+
+    @Pyro5.api.expose
+    def ping_req(self, uri):
+        return self.detector.handle_ping_req(uri)
 
     def enviar_heartbeat(self):
+        # Cada rodada sonda só alguns peers; o resto fica sabendo por gossip
         while True:
             time.sleep(HEARTBEAT_INTERVAL)
-            for idx, uri in enumerate(self.peers):
-                try:
-                    peer_name = self.peersNames[idx]
-                    with Pyro5.api.Proxy(uri) as proxy:
-                        proxy.receberHeartBeat(self.uri, self.pid) 
-                    #print(f"[{self.pid}] Heartbeat enviado para {peer_name}")
-                except Exception as e:
-                    #print(f"[{self.pid}] Erro ao enviar heartbeat para {peer_name}: {e}") 
-                    continue
+            self.detector.round()
 
     def update_peers(self):
         self.peers = []
         self.peersNames = []
-        self.peersHeartbeat = {}  
+        for uri in self.detector.members():
+            self.detector.forget(uri)
         try:
             with Pyro5.api.locate_ns() as ns:
                 entries = ns.list(prefix="ricart.")
@@ -56,7 +75,7 @@ class RicartAgrawala:
                     if uri not in self.peers and name != self.pid:
                         self.peers.append(uri)
                         self.peersNames.append(name)
-                        self.peersHeartbeat[uri] = time.time()
+                        self.detector.track(uri, name)
                         print(f"[{self.pid}] Peer encontrado no NS: {name}")
         except Exception as e:
             #print(f"[{self.pid}] Erro ao buscar peers no NameServer: {e}")
@@ -69,10 +88,8 @@ class RicartAgrawala:
         print(f"[{self.pid}] Pedindo recurso...")
 
         def request_to_peer(uri):
-            agora = time.time()
             # valida heartbeat
-            ultimo_heartbeat = self.peersHeartbeat.get(uri, 0)
-            if agora - ultimo_heartbeat > HEARTBEAT_TIMEOUT:
+            if not self.detector.is_tracked(uri):
                 print(f"[{self.pid}] Peer {uri} inativo, ignorando.")
                 return
             try:
@@ -90,11 +107,13 @@ class RicartAgrawala:
             t.start()
             threads.append(t)
 
-        while self.replies < len(self.peers):
-            time.sleep(0.1)
+        with self.replies_cond:
+            self.replies_cond.wait_for(lambda: self.replies >= len(self.peers))
 
         self.state = "HELD"
-        print(f"[{self.pid}] Recurso adquirido.")
+        latency = time.time() - self.timestamp
+        self.acquire_latencies.append(latency)
+        print(f"[{self.pid}] Recurso adquirido em {latency * 1000:.1f} ms.")
 
     @Pyro5.api.expose
     def request(self, ts, pid):
@@ -123,7 +142,9 @@ class RicartAgrawala:
     def reply(self, pid, confirmation):
         if confirmation:
             print(f"[{self.pid}] Recebi confirmação de {pid}")
-            self.replies += 1
+            with self.replies_cond:
+                self.replies += 1
+                self.replies_cond.notify_all()
         else:
             print(f"[{self.pid}] Recebi negação de {pid}.")
 
@@ -142,30 +163,34 @@ class RicartAgrawala:
         self.deferred = []
 
     def mostrar_status(self):
-        agora = time.time()
         ativos = []
         for idx, uri in enumerate(self.peers):
-            ultimo_hb = self.peersHeartbeat.get(uri, 0)
-            if agora - ultimo_hb <= HEARTBEAT_TIMEOUT:
-                ativos.append(self.peersNames[idx])
+            if self.detector.is_tracked(uri):
+                suspeito = " (suspeito)" if self.detector.is_suspect(uri) else ""
+                ativos.append(self.peersNames[idx] + suspeito)
 
         print("\n=== STATUS DO PROCESSO ===")
         print(f"Processo: {self.pid}")
         print(f"Estado: {self.state}")
         print(f"Peers ativos ({len(ativos)}): {', '.join(ativos) if ativos else 'Nenhum'}")
+        if self.acquire_latencies:
+            media = sum(self.acquire_latencies) / len(self.acquire_latencies)
+            print(f"Aquisição do recurso: última {self.acquire_latencies[-1] * 1000:.1f} ms, média {media * 1000:.1f} ms")
         print("===========================\n")
 
     def monitorar_peers(self):
         while True:
-            agora = time.time()
+            self.detector.expired()
             i = 0
             while i < len(self.peers):
                 uri = self.peers[i]
-                ultimo_hb = self.peersHeartbeat.get(uri, 0)
-                if agora - ultimo_hb > HEARTBEAT_TIMEOUT:
+                if not self.detector.is_tracked(uri):
                     self.peers.pop(i)
                     self.peersNames.pop(i)
-                    self.peersHeartbeat.pop(uri, None)
+                    self.proxies.discard(uri)
+                    # Um pedido em andamento pode não precisar mais da resposta dele
+                    with self.replies_cond:
+                        self.replies_cond.notify_all()
                 else:
                     i += 1
             time.sleep(1)
@@ -219,6 +244,8 @@ def main():
     daemon = Pyro5.api.Daemon(port=0)
     uri = daemon.register(process)
     process.uri = str(uri)
+    process.detector.self_id = process.uri
+    process.detector.info = pid
 
     with Pyro5.api.locate_ns() as ns:
         ns.register(pid, uri)
@@ -236,6 +263,7 @@ def main():
 
     # interface de usuário
     interface(process)
+    process.proxies.close()
 
 
 
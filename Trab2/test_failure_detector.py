@@ -0,0 +1,83 @@
+import time
+from failure_detector import FailureDetector
+
+
+class Cluster:
+    """Detectores no mesmo processo; call() chama o método do outro direto."""
+
+    def __init__(self, n, heartbeat_timeout=0.3):
+        self.mortos = set()
+        self.detectores = {}
+        for i in range(n):
+            self.detectores[f"p{i}"] = FailureDetector(f"p{i}", None, self.call, heartbeat_timeout, 0,
+                                                       fanout=2, on_discover=lambda peer, info: True)
+
+    def call(self, peer, method, *args, timeout=None):
+        if peer in self.mortos:
+            raise ConnectionError(peer)
+        detector = self.detectores[peer]
+        if method == "ping":
+            return detector.handle_ping(*args)
+        return detector.handle_ping_req(*args)
+
+    def vivos(self):
+        return [d for peer, d in self.detectores.items() if peer not in self.mortos]
+
+    def rodadas(self, n):
+        for _ in range(n):
+            for detector in self.vivos():
+                detector.round()
+                detector.expired()
+
+
+def test_descobre_os_peers_por_gossip():
+    cluster = Cluster(5)
+    # Cada um só conhece o p0
+    for detector in list(cluster.detectores.values())[1:]:
+        detector.track("p0")
+    cluster.rodadas(10)
+    for peer, detector in cluster.detectores.items():
+        assert sorted(detector.members()) == sorted(p for p in cluster.detectores if p != peer)
+
+
+def test_peer_morto_e_removido_sem_falsos_positivos():
+    cluster = Cluster(5)
+    for peer, detector in cluster.detectores.items():
+        for outro in cluster.detectores:
+            if outro != peer:
+                detector.track(outro)
+    cluster.rodadas(3)
+
+    cluster.mortos.add("p4")
+    cluster.rodadas(3)
+    assert all(d.is_suspect("p4") for d in cluster.vivos())
+    time.sleep(0.4)
+    cluster.rodadas(1)
+    for detector in cluster.vivos():
+        assert sorted(detector.members()) == sorted(p for p in ["p0", "p1", "p2", "p3"] if p != detector.self_id)
+
+    # Um digest velho não traz o morto de volta; um contador novo (ele voltou) traz
+    cluster.detectores["p0"].merge({"p4": (0, None)})
+    assert not cluster.detectores["p0"].is_tracked("p4")
+    cluster.detectores["p0"].merge({"p4": (100, None)})
+    assert cluster.detectores["p0"].is_tracked("p4")
+
+
+def test_contador_maior_desfaz_a_suspeita():
+    detector = FailureDetector("p0", None, None, 1, 0)
+    detector.track("p1", counter=5)
+    detector.suspects["p1"] = time.time()
+    detector.merge({"p1": (5, None)})
+    assert detector.is_suspect("p1")
+    detector.merge({"p1": (6, None)})
+    assert not detector.is_suspect("p1")
+
+
+def test_ping_req_so_sonda_peers_acompanhados():
+    chamados = []
+    detector = FailureDetector("p0", None, lambda peer, *args, timeout=None: chamados.append(peer) or {}, 1, 0)
+    assert detector.handle_ping_req("p9") is False
+    assert chamados == []
+    detector.track("p1")
+    assert detector.handle_ping_req("p1") is True
+    assert chamados == ["p1"]